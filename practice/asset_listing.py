@@ -0,0 +1,86 @@
+"""
+Compares the asset, balance and market listings as they were (matching each stexchange row against all of the
+currencies with `filter` and `any`) against the symbol-indexed lookups, with 500 assets.
+
+    $ python practice/asset_listing.py
+
+"""
+import timeit
+
+from stemerald.controllers.assets import assets_to_dict, balances_to_dict
+from stemerald.controllers.market import market_list_to_dict
+from stemerald.models import Market
+from stemerald.models.currencies import Cryptocurrency, Fiat
+
+ASSETS = 500
+REPEAT = 5
+
+usd = Fiat(symbol='USD', name='USA Dollar', smallest_unit_scale=-2, normalization_scale=0)
+currencies = [usd] + [
+    Cryptocurrency(symbol=f'C{i:03}', name=f'Coin {i}', wallet_id=f'C{i:03}', smallest_unit_scale=-8,
+                   normalization_scale=0)
+    for i in range(ASSETS - 1)
+]
+markets = [Market(name=f'{c.symbol}_USD', base_currency=c, quote_currency=usd) for c in currencies[1:]]
+
+assets = [{'name': c.symbol, 'prec': 8} for c in currencies]
+balances = {c.symbol: {'available': '1.5', 'freeze': '0.25'} for c in currencies}
+market_list = [
+    {'name': m.name, 'stock': m.base_currency.symbol, 'stock_prec': 8, 'money': 'USD', 'fee_prec': 4,
+     'min_amount': '0.001', 'money_prec': 2}
+    for m in markets
+]
+
+currencies_by_symbol = {c.symbol: c for c in currencies}
+markets_by_name = {m.name: m for m in markets}
+
+
+def legacy_assets():
+    return [{
+        'name': x['name'],
+        'currency': list(filter(lambda y: y.symbol == x['name'], currencies))[0].to_dict(),
+        'prec': x['prec'],
+    } for x in assets if any(x['name'] == sm.symbol for sm in currencies)]
+
+
+def legacy_balances():
+    result = []
+    asset_names = {x['name'] for x in assets}
+    for key, value in balances.items():
+        if key in asset_names and any(key == sm.symbol for sm in currencies):
+            currency = list(filter(lambda x: x.symbol == key, currencies))[0]
+            result.append({
+                'name': key,
+                'currency': currency.to_dict(),
+                'available': currency.normalized_to_output(value['available']),
+                'freeze': currency.normalized_to_output(value['freeze']),
+            })
+    return result
+
+
+def legacy_markets():
+    return [
+        {
+            'name': market['name'],
+            'stock': market['stock'],
+            'stockPrec': market['stock_prec'],
+            'money': market['money'],
+            'feePrec': market['fee_prec'],
+            'minAmount': list(filter(lambda y: y.name == market['name'], markets))[0]
+                .base_currency.normalized_to_output(market['min_amount']),
+            'moneyPrec': market['money_prec'],
+        } for market in market_list if any(market['name'] == sm.name for sm in markets)
+    ]
+
+
+cases = (
+    ('assets', legacy_assets, lambda: assets_to_dict(assets, currencies_by_symbol.get)),
+    ('balances', legacy_balances, lambda: balances_to_dict(assets, balances, currencies_by_symbol.get)),
+    ('markets', legacy_markets, lambda: market_list_to_dict(market_list, markets_by_name.get)),
+)
+
+for title, legacy, indexed in cases:
+    assert legacy() == indexed()
+    for kind, function in (('legacy', legacy), ('indexed', indexed)):
+        best = min(timeit.repeat(function, number=1, repeat=REPEAT))
+        print(f'{title:>10} {kind:>8}: {best * 1000:8.2f} ms per {ASSETS} assets')
@@ -0,0 +1,66 @@
+"""
+Compares the per-value `Currency.normalized_to_output` (as it was) against the precompiled
+`CurrencyFormatter.format_many` on 10k-row klines.
+
+    $ python practice/currency_formatting.py
+
+"""
+import random
+import timeit
+from decimal import Decimal
+
+from stemerald.models import Market
+from stemerald.models.currencies import Cryptocurrency, Fiat
+from stemerald.controllers.market import kline_to_dict
+
+ROWS = 10000
+REPEAT = 5
+
+usd = Fiat(symbol='USD', name='USA Dollar', smallest_unit_scale=-2, normalization_scale=0)
+btc = Cryptocurrency(symbol='BTC', name='Bitcoin', smallest_unit_scale=-8, normalization_scale=0)
+market = Market(name='BTC_USD', base_currency=btc, quote_currency=usd)
+
+
+def random_number():
+    return str(Decimal(random.randint(1, 10 ** 12)).scaleb(-8))
+
+
+kline = [
+    [1547419213 + i * 60, random_number(), random_number(), random_number(), random_number(), random_number(),
+     random_number(), market.name]
+    for i in range(ROWS)
+]
+
+
+def legacy_normalized_to_output(currency, number):
+    if number is None:
+        return None
+    if not isinstance(number, Decimal):
+        number = Decimal(number)
+
+    return ('{:.' + str(max(0, -currency.smallest_unit_scale)) + 'f}') \
+        .format(number.scaleb(- currency.normalization_scale))
+
+
+def per_value():
+    return [{
+        'market': market.name,
+        'time': k[0],
+        'o': legacy_normalized_to_output(market.quote_currency, k[1]),
+        'h': legacy_normalized_to_output(market.quote_currency, k[3]),
+        'l': legacy_normalized_to_output(market.quote_currency, k[4]),
+        'c': legacy_normalized_to_output(market.quote_currency, k[2]),
+        'volume': legacy_normalized_to_output(market.base_currency, k[5]),
+        'amount': legacy_normalized_to_output(market.base_currency, k[6]),
+    } for k in kline]
+
+
+def bulk():
+    return kline_to_dict(market, kline)
+
+
+assert per_value() == bulk()
+
+for title, function in (('per-value', per_value), ('format_many', bulk)):
+    best = min(timeit.repeat(function, number=1, repeat=REPEAT))
+    print(f'{title:>12}: {best * 1000:8.2f} ms per {ROWS} rows')
@@ -17,6 +17,7 @@ dependencies = [
     'wand >= 0.4.3',
     'ujson',
     'requests',
+    'aiohttp',
     'oath',
     'pycrypto',
     'qrcode',
@@ -8,10 +8,12 @@ from sqlalchemy_media import StoreManager, FileSystemStore
 
 from stemerald import basedata
 from stemerald.authentication import Authenticator
+from stemerald.cache import redis_client, market_data_cache, balance_cache
 from stemerald.controllers.root import Root
-from stemerald.launchers import WalletSyncLauncher
+from stemerald.klines import kline_store
+from stemerald.launchers import WalletSyncLauncher, SmsDrainLauncher, PushGatewayLauncher
 from stemerald.stawallet import stawallet_client
-from stemerald.stexchange import stexchange_client
+from stemerald.stexchange import stexchange_client, async_stexchange_client
 
 __version__ = '2.0.1'
 
@@ -31,6 +33,42 @@ class Application(BaseApplication):
       password: ~
       db: 0
     
+    authentication:
+      member_claims_ttl: 60 # Seconds, how long the claims (e.g. roles) are cached for refreshing the tokens
+    
+    market_cache:
+      enabled: true
+      lock_timeout: 2 # Seconds, how long concurrent misses wait for the one which is fetching
+      ttl: # Seconds, per stexchange method
+        market_last: 1
+        market_status: 2
+        market_status_today: 2
+        market_summary: 2
+        market_list: 30
+        order_book: 1
+        order_depth: 1
+        market_kline: 5
+        asset_list: 30
+    
+    balance_cache:
+      enabled: true
+      ttl: 3 # Seconds, how late the changes which are made by the engine itself (e.g. the fills) may be seen
+    
+    push_gateway:
+      host: 0.0.0.0
+      port: 8082
+      poll_gap: 1 # Seconds, between the polls of each market which has any subscribers
+      depth_limit: 10
+      deals_limit: 50
+      queue_size: 100 # Messages waiting for each client, the slower clients are disconnected
+      heartbeat: 15 # Seconds
+    
+    kline_store:
+      enabled: true # Keeps the closed candles in redis, see stemerald.klines
+      ttl: 2592000 # Seconds
+      grace: 5 # Seconds, after the end of a candle before it is taken as closed
+      max_candles: 5000 # Per request
+    
     media_storage:
       file_system_dir: %(root_path)s/data/media-storage
       base_url: http://localhost:8081/media
@@ -61,6 +99,11 @@ class Application(BaseApplication):
 
     sms:
       provider: stemerald.sms.KavenegarSmsProvider
+      pool_size: 4 # Keep-alive connections to the provider, also how many sms are sent at the same time
+      connect_timeout: 3 # Seconds
+      read_timeout: 10 # Seconds
+      drain_batch_size: 50 # Sms tasks sent at once by the drainsms looper
+      drain_gap: 1 # Seconds, between the batches when the queue is empty
 
       kavenegar:
         verification_code_url: https://api.kavenegar.com/v1/3277760553034736E260553055303470553034736E2356413D3D/verify/lookup.json
@@ -92,13 +135,31 @@ class Application(BaseApplication):
 
     stexchange: 
       rpc_url: "http://localhost:8080"
+      pool_size: 10 # Keep-alive connections per worker process
+      pool_block: false # Wait for a free connection instead of opening a throw-away one when saturated
+      connect_timeout: 3 # Seconds
+      read_timeout: 10 # Seconds
 
     stawallet: 
       rest_url: "http://localhost:8080"
+      pool_size: 10 # Keep-alive connections per worker process
+      connect_timeout: 3 # Seconds
+      read_timeout: 10 # Seconds
+      get_retries: 2 # Just the GET requests are retried on the read and the gateway errors
+      retry_backoff: 0.2 # Seconds, doubled for each retry
       sync_gap: 3 # seconds
+      # The deposits are pushed to /apiv2/stawallet-hooks/deposits when this is set, so the looper just reconciles
+      # the missed ones every reconciliation_gap seconds, instead of polling every sync_gap seconds
+      webhook_secret: ~
+      reconciliation_gap: 300 # seconds
+      sync_concurrency: 4 # How many cryptocurrencies are synced at the same time
+      sync_commit_batch_size: 500 # Deposits credited per commit
 
     firebase:
       service_account_key: "/var/stemerald/stacrypt-1c4dc-firebase-adminsdk-hy7hb-ad49502f48.json"
+      # The broadcast notifications are sent to this topic, or to all of the known devices (using multicast) if it
+      # is empty
+      broadcast_topic: all
 
     """
 
@@ -143,8 +204,49 @@ class Application(BaseApplication):
 
     def configure(self, files=None, context=None, **kwargs):
         super().configure(files, context, **kwargs)
-        stexchange_client.initialize(server_url=settings.stexchange.rpc_url, force=True)
-        stawallet_client.initialize(server_url=settings.stawallet.rest_url, force=True)
+        redis_client.initialize(
+            host=settings.redis.host,
+            port=settings.redis.port,
+            db=settings.redis.db,
+            password=settings.redis.password,
+            force=True
+        )
+        market_data_cache.initialize(
+            enabled=settings.market_cache.enabled,
+            ttl=settings.market_cache.ttl,
+            lock_timeout=settings.market_cache.lock_timeout,
+            force=True
+        )
+        balance_cache.initialize(
+            enabled=settings.balance_cache.enabled,
+            ttl=settings.balance_cache.ttl,
+            force=True
+        )
+        kline_store.initialize(
+            enabled=settings.kline_store.enabled,
+            ttl=settings.kline_store.ttl,
+            grace=settings.kline_store.grace,
+            max_candles=settings.kline_store.max_candles,
+            force=True
+        )
+        for client in (stexchange_client, async_stexchange_client):
+            client.initialize(
+                server_url=settings.stexchange.rpc_url,
+                pool_size=settings.stexchange.pool_size,
+                pool_block=settings.stexchange.pool_block,
+                connect_timeout=settings.stexchange.connect_timeout,
+                read_timeout=settings.stexchange.read_timeout,
+                force=True
+            )
+        stawallet_client.initialize(
+            server_url=settings.stawallet.rest_url,
+            pool_size=settings.stawallet.pool_size,
+            connect_timeout=settings.stawallet.connect_timeout,
+            read_timeout=settings.stawallet.read_timeout,
+            get_retries=settings.stawallet.get_retries,
+            retry_backoff=settings.stawallet.retry_backoff,
+            force=True
+        )
 
     def initialize_models(self, session=None):
         StoreManager.register(
@@ -160,6 +262,8 @@ class Application(BaseApplication):
 
     def register_cli_launchers(self, subparsers):
         WalletSyncLauncher.register(subparsers)
+        SmsDrainLauncher.register(subparsers)
+        PushGatewayLauncher.register(subparsers)
 
 
 stemerald = Application()
@@ -1,11 +1,16 @@
+import functools
+import threading
+
+import redis
 import ujson
 from nanohttp import HttpBadRequest, settings, context
 from restfulpy.authentication import StatefulAuthenticator
 from restfulpy.logging_ import get_logger
 from restfulpy.orm import DBSession
-from restfulpy.principal import JwtPrincipal
+from restfulpy.principal import JwtPrincipal, JwtRefreshToken
 from sqlalchemy_media import store_manager
 
+from stemerald.helpers import call_after_commit
 from stemerald.models import Member
 
 logger = get_logger('auth')
@@ -17,15 +22,77 @@ class Authenticator(StatefulAuthenticator):
     """
 
     firebase_token_request_header = 'HTTP_X_FIREBASE_TOKEN'
+    member_claims_key = 'auth:member:%s:claims'
+
+    def __init__(self):
+        super().__init__()
+        # The members which are being changed (not committed yet) in the current thread
+        self._uncommitted = threading.local()
 
     @store_manager(DBSession)
     def create_principal(self, member_id=None, session_id=None):
-        member = Member.query.filter(Member.id == member_id).one()
-        return member.create_jwt_principal(session_id=session_id)
+        return Member.create_jwt_principal_of(self.get_member_claims(member_id), session_id=session_id)
 
     def create_refresh_principal(self, member_id=None):
-        member = Member.query.filter(Member.id == member_id).one()
-        return member.create_refresh_principal()
+        return JwtRefreshToken(dict(id=self.get_member_claims(member_id)['id']))
+
+    def get_member_claims(self, member_id):
+        """
+        The claims of the member which the principals are made of, cached in redis for
+        `authentication.member_claims_ttl` seconds, to not query the database on each token refresh.
+
+        The cache should be forgotten (after the commit) whenever the claims may change, see `invalidate_member` and
+        `forget_member_claims`.
+        """
+        key = self.member_claims_key % member_id
+        cacheable = member_id not in getattr(self._uncommitted, 'member_ids', ())
+
+        if cacheable:
+            try:
+                cached = self.redis.get(key)
+                if cached is not None:
+                    return ujson.loads(cached)
+            except redis.RedisError:
+                logger.exception('Cannot read the member claims cache')
+
+        claims = Member.query.filter(Member.id == member_id).one().claims
+
+        if cacheable:
+            self._cache_member_claims(claims)
+
+        return claims
+
+    def _cache_member_claims(self, claims):
+        try:
+            self.redis.set(
+                self.member_claims_key % claims['id'],
+                ujson.dumps(claims),
+                ex=settings.authentication.member_claims_ttl
+            )
+        except redis.RedisError:
+            logger.exception('Cannot write the member claims cache')
+
+    def forget_member_claims(self, member_id):
+        try:
+            self.redis.delete(self.member_claims_key % member_id)
+        except redis.RedisError:
+            logger.exception('Cannot forget the member claims')
+
+    def forget_member_claims_after_commit(self, member_id):
+        call_after_commit(DBSession, functools.partial(self.forget_member_claims, member_id))
+
+    def invalidate_member(self, member_id=None):
+        # The current session is refreshed here using the uncommitted state of the member, which should not be cached
+        member_ids = self._uncommitted.member_ids = getattr(self._uncommitted, 'member_ids', set())
+        member_ids.add(member_id)
+        try:
+            self.forget_member_claims(member_id)
+            super().invalidate_member(member_id)
+        finally:
+            member_ids.discard(member_id)
+
+        # The other workers may cache the old state meanwhile
+        self.forget_member_claims_after_commit(member_id)
 
     def validate_credentials(self, credentials):
         email, password = credentials
@@ -39,14 +106,79 @@ class Authenticator(StatefulAuthenticator):
             logger.info(f'Login failed (account-deactivated): "{email}"')
             raise HttpBadRequest('Your account has been deactivated.', 'account-deactivated')
 
+        # The member is already loaded, so the principal of the login is made of the fresh claims
+        self._cache_member_claims(member.claims)
         return member
 
     def get_member_sessions_info(self, member_id):
-        session_info_list = []
-        for session_id in (self.redis.smembers(self.get_member_sessions_key(member_id)) or []):
-            session_info_list.append(self.get_session_info(session_id))
+        """
+        The info of the sessions of the member, in two round trips (SMEMBERS and MGET), regardless of the number of
+        the sessions. The expired sessions are None.
+        """
+        return self._get_sessions_info(list(self.redis.smembers(self.get_member_sessions_key(member_id)) or []))
+
+    def get_members_sessions_info(self, member_ids, chunk_size=1000):
+        """
+        The bulk version of `get_member_sessions_info`, to fan out to many members at once.
+
+        :return: {member_id: [session_info, ...]}
+        """
+        member_ids = list(member_ids)
+        pipeline = self.redis.pipeline(transaction=False)
+        for member_id in member_ids:
+            pipeline.smembers(self.get_member_sessions_key(member_id))
+        members_session_ids = [list(session_ids or []) for session_ids in pipeline.execute()] if member_ids else []
+
+        infos = iter(self._get_sessions_info(
+            [session_id for ids in members_session_ids for session_id in ids],
+            chunk_size=chunk_size
+        ))
+        return {
+            member_id: [next(infos) for __ in ids]
+            for member_id, ids in zip(member_ids, members_session_ids)
+        }
+
+    def get_all_sessions_info(self, chunk_size=1000):
+        """
+        The info of all of the (alive) sessions, fetched `chunk_size` sessions per round trip.
+        """
+        session_ids = list(self.redis.hkeys(self.sessions_key))
+        return [info for info in self._get_sessions_info(session_ids, chunk_size=chunk_size) if info is not None]
+
+    def _get_sessions_info(self, session_ids, chunk_size=1000):
+        """
+        The info of the sessions (None for the expired ones) in the same order, using one MGET per `chunk_size`
+        sessions.
+        """
+        result = []
+        for i in range(0, len(session_ids), chunk_size):
+            chunk = session_ids[i:i + chunk_size]
+            infos = self.redis.mget([self.get_session_info_key(session_id.decode()) for session_id in chunk])
+            result.extend(self._parse_session_info(session_id, info) for session_id, info in zip(chunk, infos))
+
+        return result
+
+    @staticmethod
+    def _parse_session_info(session_id, info):
+        if info:
+            result = {'id': session_id}
+            result.update(ujson.loads(info))
+            return result
+        return None
 
-        return session_info_list
+    def remove_firebase_tokens(self, member_id, tokens, sessions=None):
+        """
+        Forgets the (stale) firebase `tokens` in the sessions info of the member.
+        """
+        for info in (sessions or self.get_member_sessions_info(member_id)):
+            if info is None or info.get('firebaseToken') not in tokens:
+                continue
+
+            info = dict(info)
+            session_id = info.pop('id').decode()
+            info['firebaseToken'] = ''
+            # Just if the session is not terminated meanwhile
+            self.redis.set(self.get_session_info_key(session_id), ujson.dumps(info), xx=True)
 
     def login(self, credentials):
         principal = super().login(credentials)
@@ -57,12 +189,7 @@ class Authenticator(StatefulAuthenticator):
 
     # TODO: Open an issue on restfulpy for this:
     def get_session_info(self, session_id):
-        info = self.redis.get(self.get_session_info_key(session_id.decode()))
-        if info:
-            result = {'id': session_id}
-            result.update(ujson.loads(info))
-            return result
-        return None
+        return self._parse_session_info(session_id, self.redis.get(self.get_session_info_key(session_id.decode())))
 
     def extract_agent_info(self):
         result = super().extract_agent_info()
@@ -0,0 +1,199 @@
+import threading
+import time
+import uuid
+
+import redis
+import ujson
+from restfulpy.logging_ import get_logger
+
+from stemerald.helpers import DeferredObject
+from stemerald.stexchange import stexchange_client
+
+logger = get_logger('CACHE')
+
+redis_client: redis.StrictRedis = DeferredObject(redis.StrictRedis)
+
+
+class MarketDataCache:
+    """
+    A short-living cache in front of the stexchange market-data methods. It is backed by redis, so it is shared
+    between all of the workers.
+
+    Concurrent misses of a key are coalesced: Just the caller which acquires the key's lock calls the engine, the
+    others wait (at most `lock_timeout` seconds) for its result to land in the cache.
+
+    Usage:
+
+        depth = market_data_cache.call('order_depth', market.name, limit, interval)
+
+    """
+    prefix = 'market-cache'
+
+    # Deletes the lock just if it is still owned by the caller, it might be expired and taken by another one
+    release_lock_script = """
+    if redis.call('get', KEYS[1]) == ARGV[1] then
+        return redis.call('del', KEYS[1])
+    end
+    return 0
+    """
+
+    def __init__(self, enabled=True, ttl=None, lock_timeout=2, wait_interval=.02):
+        self.enabled = enabled
+        self.ttl = dict(ttl or {})
+        self.lock_timeout = lock_timeout
+        self.wait_interval = wait_interval
+
+        self._stats_lock = threading.Lock()
+        self._stats = {}
+
+    def _count(self, method, kind):
+        with self._stats_lock:
+            method_stats = self._stats.setdefault(method, {'hits': 0, 'misses': 0, 'coalesced': 0, 'errors': 0})
+            method_stats[kind] += 1
+
+    def stats(self):
+        with self._stats_lock:
+            return {method: dict(method_stats) for method, method_stats in self._stats.items()}
+
+    def _key(self, method, args):
+        return ':'.join([self.prefix, method, *map(str, args)])
+
+    def call(self, method, *args):
+        fetch = getattr(stexchange_client, method)
+        ttl = self.ttl.get(method)
+        if not self.enabled or not ttl:
+            return fetch(*args)
+
+        try:
+            return self._get_or_fetch(method, self._key(method, args), ttl, lambda: fetch(*args))
+        except redis.RedisError:
+            logger.exception(f'Market data cache is not available, calling {method} directly')
+            self._count(method, 'errors')
+            return fetch(*args)
+
+    def _get_or_fetch(self, method, key, ttl, fetch):
+        cached = redis_client.get(key)
+        if cached is not None:
+            self._count(method, 'hits')
+            return ujson.loads(cached)
+
+        self._count(method, 'misses')
+        lock_key = f'{key}:lock'
+        token = uuid.uuid4().hex
+        if redis_client.set(lock_key, token, nx=True, px=int(self.lock_timeout * 1000)):
+            try:
+                result = fetch()
+            except BaseException:
+                self._release_lock(lock_key, token)
+                raise
+
+            # The result is already fetched, so a redis failure from now on should not cause another fetch
+            try:
+                redis_client.set(key, ujson.dumps(result), px=int(ttl * 1000))
+            except redis.RedisError:
+                logger.exception(f'Cannot write the market data cache of {method}')
+                self._count(method, 'errors')
+            self._release_lock(lock_key, token)
+            return result
+
+        # Another caller is fetching it right now
+        deadline = time.time() + self.lock_timeout
+        while time.time() < deadline:
+            time.sleep(self.wait_interval)
+            cached = redis_client.get(key)
+            if cached is not None:
+                self._count(method, 'coalesced')
+                return ujson.loads(cached)
+
+            if not redis_client.exists(lock_key):
+                # The lock holder has failed
+                break
+
+        return fetch()
+
+    def _release_lock(self, lock_key, token):
+        try:
+            redis_client.eval(self.release_lock_script, 1, lock_key, token)
+        except redis.RedisError:
+            # It expires anyway
+            logger.exception('Cannot release the market data cache lock')
+
+
+market_data_cache: MarketDataCache = DeferredObject(MarketDataCache)
+
+
+class BalanceCache:
+    """
+    Caches the balances of each user (`balance_query` of all of the assets) in redis for `ttl` seconds, in front of
+    the polling of the balances.
+
+    Our own calls which change a balance (`balance_update`, `order_put_*` and `order_cancel`) should `invalidate`
+    the user right after them. The changes which are made by the engine itself (e.g. the fills of the resting
+    orders) are seen after at most `ttl` seconds.
+
+    Each user has a generation, which is increased by `invalidate`. A cached entry is used just if it belongs to
+    the current generation, so a fetch which is overlapped with an invalidation never serves the old balances.
+
+    Usage:
+
+        balances = balance_cache.get(user_id)
+        ...
+        stexchange_client.order_cancel(user_id, market, order_id)
+        balance_cache.invalidate(user_id)
+
+    """
+    prefix = 'balance-cache'
+    generation_ttl = 3600  # Seconds, should be much longer than a fetch
+
+    def __init__(self, enabled=True, ttl=3):
+        self.enabled = enabled
+        self.ttl = ttl
+
+    def _key(self, user_id):
+        return f'{self.prefix}:{user_id}'
+
+    def get(self, user_id):
+        if not self.enabled:
+            return stexchange_client.balance_query(user_id)
+
+        key = self._key(user_id)
+        try:
+            cached, generation = redis_client.mget([key, f'{key}:generation'])
+        except redis.RedisError:
+            logger.exception('Balance cache is not available, calling the engine directly')
+            return stexchange_client.balance_query(user_id)
+
+        generation = int(generation or 0)
+        if cached is not None:
+            cached = ujson.loads(cached)
+            if cached['generation'] == generation:
+                return cached['balances']
+
+        balances = stexchange_client.balance_query(user_id)
+        try:
+            redis_client.set(
+                key,
+                ujson.dumps({'generation': generation, 'balances': balances}),
+                px=int(self.ttl * 1000)
+            )
+        except redis.RedisError:
+            logger.exception('Cannot write the balance cache')
+
+        return balances
+
+    def invalidate(self, *user_ids):
+        if not self.enabled:
+            return
+
+        try:
+            pipeline = redis_client.pipeline()
+            for user_id in user_ids:
+                generation_key = f'{self._key(user_id)}:generation'
+                pipeline.incr(generation_key)
+                pipeline.expire(generation_key, self.generation_ttl)
+            pipeline.execute()
+        except redis.RedisError:
+            logger.exception('Cannot invalidate the balance cache')
+
+
+balance_cache: BalanceCache = DeferredObject(BalanceCache)
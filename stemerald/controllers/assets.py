@@ -5,21 +5,82 @@ from restfulpy.authorization import authorize
 from restfulpy.utils import format_iso_datetime
 from restfulpy.validation import validate_form, prevent_form
 
-from stemerald.models import Currency
+from stemerald.cache import market_data_cache, balance_cache
+from stemerald.registry import metadata_registry
 from stemerald.stexchange import stexchange_client, StexchangeException, stexchange_http_exception_handler
 
 
+def assets_to_dict(assets, get_currency):
+    """
+    The (stexchange) assets which are supported, `get_currency` looks the currency of the asset up by symbol (e.g.
+    `metadata_registry.get_currency`).
+    """
+    result = []
+    for asset in assets:
+        currency = get_currency(asset['name'])
+        if currency is None:
+            continue
+
+        result.append({
+            'name': asset['name'],
+            'currency': currency.to_dict(),
+            'prec': asset['prec'],
+        })
+
+    return result
+
+
+def asset_summaries_to_dict(asset_summaries, get_currency):
+    result = []
+    for asset in asset_summaries:
+        currency = get_currency(asset['name'])
+        if currency is None:
+            continue
+
+        result.append({
+            'name': asset['name'],
+            'currency': currency.to_dict(),
+            'totalBalance': currency.normalized_to_output(asset['total_balance']),
+            'availableCount': currency.normalized_to_output(asset['available_count']),
+            'availableBalance': currency.normalized_to_output(asset['available_balance']),
+            'freezeCount': currency.normalized_to_output(asset['available_count']),
+            'freezeBalance': currency.normalized_to_output(asset['available_count']),
+        })
+
+    return result
+
+
+def balances_to_dict(assets, balances, get_currency):
+    """
+    The balances of the assets which are both listed by stexchange and supported.
+    """
+    asset_names = {x['name'] for x in assets}
+
+    result = []
+    for key, value in balances.items():
+        if key not in asset_names:
+            continue
+
+        currency = get_currency(key)
+        if currency is None:
+            continue
+
+        result.append({
+            'name': key,
+            'currency': currency.to_dict(),
+            'available': currency.normalized_to_output(value['available']),
+            'freeze': currency.normalized_to_output(value['freeze']),
+        })
+
+    return result
+
+
 class AssetsController(RestController):
 
     @json
     def list(self):
-        supporting_assets = Currency.query.all()
         try:
-            return [{
-                'name': x['name'],
-                'currency': list(filter(lambda y: y.symbol == x['name'], supporting_assets))[0].to_dict(),
-                'prec': x['prec'],
-            } for x in stexchange_client.asset_list() if any(x['name'] == sm.symbol for sm in supporting_assets)]
+            return assets_to_dict(stexchange_client.asset_list(), metadata_registry.get_currency)
 
         except StexchangeException as e:
             raise stexchange_http_exception_handler(e)
@@ -29,27 +90,7 @@ class AssetsController(RestController):
     def overview(self):
 
         try:
-            response = []
-            asset_summaries = stexchange_client.asset_summary()
-
-            for asset in asset_summaries:
-                currency = Currency.query.filter(Currency.symbol == asset['name']).one_or_none()
-                if currency is None:
-                    continue
-
-                response.append(
-                    {
-                        'name': asset['name'],
-                        'currency': currency.to_dict(),
-                        'totalBalance': currency.normalized_to_output(asset['total_balance']),
-                        'availableCount': currency.normalized_to_output(asset['available_count']),
-                        'availableBalance': currency.normalized_to_output(asset['available_balance']),
-                        'freezeCount': currency.normalized_to_output(asset['available_count']),
-                        'freezeBalance': currency.normalized_to_output(asset['available_count']),
-                    }
-                )
-
-            return response
+            return asset_summaries_to_dict(stexchange_client.asset_summary(), metadata_registry.get_currency)
 
         except StexchangeException as e:
             raise stexchange_http_exception_handler(e)
@@ -62,24 +103,14 @@ class BalancesController(RestController):
     @authorize("client")
     @prevent_form
     def overview(self):
-        supporting_assets = Currency.query.all()
-        asset_names = [x['name'] for x in stexchange_client.asset_list()]
-        result = []
         try:
-            for key, value in stexchange_client.balance_query(context.identity.id, *asset_names).items():
-                if any(key == sm.symbol for sm in supporting_assets):
-                    currency = list(filter(lambda x: x.symbol == key, supporting_assets))[0]
-                    result.append({
-                        'name': key,
-                        'currency': currency.to_dict(),
-                        'available': currency.normalized_to_output(value['available']),
-                        'freeze': currency.normalized_to_output(value['freeze']),
-                    })
+            assets = market_data_cache.call('asset_list')
+            balances = balance_cache.get(context.identity.id)
 
         except StexchangeException as e:
             raise stexchange_http_exception_handler(e)
 
-        return result
+        return balances_to_dict(assets, balances, metadata_registry.get_currency)
 
     @json
     @authorize("client")
@@ -87,7 +118,7 @@ class BalancesController(RestController):
         exact=['asset', 'page'], types={'page': int}
     )
     def history(self):
-        currency = Currency.query.filter(Currency.symbol == context.query_string.get('asset', None)).one_or_none()
+        currency = metadata_registry.get_currency(context.query_string.get('asset', None))
         if currency is None:
             raise HttpBadRequest('Currency not found', 'market-not-found')
         try:
@@ -1,22 +1,135 @@
 from datetime import datetime
 
-from nanohttp import RestController, json, context, HttpBadRequest
+from nanohttp import RestController, json, context, HttpBadRequest, action
 from restfulpy.authorization import authorize
 from restfulpy.utils import format_iso_datetime
 from restfulpy.validation import prevent_form, validate_form
 
+from stemerald.cache import market_data_cache
+from stemerald.helpers import stream_json_list
+from stemerald.klines import kline_store, KlineRangeException
 from stemerald.models import Market
+from stemerald.registry import metadata_registry
 from stemerald.stexchange import stexchange_client, StexchangeException, stexchange_http_exception_handler
 
+KLINE_CHUNK_SIZE = 500
+
+
+def user_deal_to_dict(market: Market, deal):
+    return {
+        'id': deal['id'],
+        'time': format_iso_datetime(datetime.utcfromtimestamp(int(deal['time']))) if 'time' in deal else None,
+        'side': deal['side'],
+        'user': deal['user'],
+        'price': market.quote_currency.normalized_to_output(deal['price']),
+        'amount': market.base_currency.normalized_to_output(deal['amount']),
+        'fee': market.quote_currency.normalized_to_output(deal['fee']),  # FIXME: Is it (quote_currency)
+        'deal': market.quote_currency.normalized_to_output(deal['deal']),  # FIXME: Is it (quote_currency)
+        'dealOrderId': deal['deal_order_id'],
+        'role': deal['role'],
+    }
+
+
+def market_deal_to_dict(market: Market, deal):
+    return {
+        'id': deal['id'],
+        'time': format_iso_datetime(datetime.utcfromtimestamp(int(deal['time']))) if 'time' in deal else None,
+        'price': market.quote_currency.normalized_to_output(deal['price']),
+        'amount': market.base_currency.normalized_to_output(deal['amount']),
+        'type': deal['type'],
+    }
+
+
+def kline_to_dict(market: Market, kline):
+    quote_formatter = market.quote_currency.formatter
+    base_formatter = market.base_currency.formatter
+    opens, closes, highs, lows = (quote_formatter.format_many(k[i] for k in kline) for i in (1, 2, 3, 4))
+    # FIXME: Is it (base_currency) right?
+    volumes, amounts = (base_formatter.format_many(k[i] for k in kline) for i in (5, 6))
+
+    return [{
+        'market': market.name,
+        'time': k[0],
+        'o': o,
+        'h': h,
+        'l': l,
+        'c': c,
+        'volume': volume,
+        'amount': amount,
+    } for k, o, c, h, l, volume, amount in zip(kline, opens, closes, highs, lows, volumes, amounts)]
+
+
+def iter_kline_to_dict(market: Market, kline, chunk_size=KLINE_CHUNK_SIZE):
+    """
+    Lazily does the same as `kline_to_dict`, still formatting `chunk_size` rows at once.
+    """
+    for i in range(0, len(kline), chunk_size):
+        yield from kline_to_dict(market, kline[i:i + chunk_size])
+
+
+def depth_to_dict(market: Market, depth):
+    def side_to_dict(orders):
+        prices = market.quote_currency.formatter.format_many(o[0] for o in orders)
+        amounts = market.base_currency.formatter.format_many(o[1] for o in orders)
+        return [{'price': price, 'amount': amount} for price, amount in zip(prices, amounts)]
+
+    return {
+        'asks': side_to_dict(depth['asks']),
+        'bids': side_to_dict(depth['bids']),
+    }
+
+
+def last_to_dict(market: Market, last):
+    return {
+        'name': market.name,
+        'price': market.quote_currency.normalized_to_output(last),
+    }
+
+
+def status_to_dict(market: Market, status):
+    return {
+        'open': market.quote_currency.normalized_to_output(status['open']),
+        'high': market.quote_currency.normalized_to_output(status['high']),
+        'low': market.quote_currency.normalized_to_output(status['low']),
+        'close': market.quote_currency.normalized_to_output(status.get('close', None)),
+        'volume': market.base_currency.normalized_to_output(status['volume']),
+        # FIXME: Is it (base_currency) right?
+        'deal': market.quote_currency.normalized_to_output(status['deal']),  # FIXME: Is it (quote_currency) right?
+        'last': market.quote_currency.normalized_to_output(status['last']),
+        'period': status.get('period', None),
+    }
+
+
+def market_list_to_dict(markets, get_market):
+    """
+    The (stexchange) markets which are supported, `get_market` looks the market up by name (e.g.
+    `metadata_registry.get_market`).
+    """
+    result = []
+    for market in markets:
+        supported_market = get_market(market['name'])
+        if supported_market is None:
+            continue
+
+        result.append({
+            'name': market['name'],
+            'stock': market['stock'],
+            'stockPrec': market['stock_prec'],
+            'money': market['money'],
+            'feePrec': market['fee_prec'],
+            'minAmount': supported_market.base_currency.normalized_to_output(market['min_amount']),
+            'moneyPrec': market['money_prec'],
+        })
+
+    return result
+
 
 class MarketController(RestController):
 
     def __fetch_market(self, market_name=None) -> Market:
         market_name = (market_name or context.query_string.get("marketName", None)) \
                       or context.form.get("marketName", None)
-        market = Market.query \
-            .filter(Market.name == market_name) \
-            .one_or_none()
+        market = metadata_registry.get_market(market_name)
 
         if market is None:
             raise HttpBadRequest('Bad market', 'bad-market')
@@ -32,25 +145,12 @@ class MarketController(RestController):
                 offset=int(context.query_string['offset']),
                 limit=int(context.query_string['limit'])
             )
-            return [
-                {
-                    'id': deal['id'],
-                    'time': format_iso_datetime(
-                        datetime.utcfromtimestamp(int(deal['time']))) if 'time' in deal else None,
-                    'side': deal['side'],
-                    'user': deal['user'],
-                    'price': market.quote_currency.normalized_to_output(deal['price']),
-                    'amount': market.base_currency.normalized_to_output(deal['amount']),
-                    'fee': market.quote_currency.normalized_to_output(deal['fee']),  # FIXME: Is it (quote_currency)
-                    'deal': market.quote_currency.normalized_to_output(deal['deal']),  # FIXME: Is it (quote_currency)
-                    'dealOrderId': deal['deal_order_id'],
-                    'role': deal['role'],
-                } for deal in response['records']
-            ]
         except StexchangeException as e:
             raise stexchange_http_exception_handler(e)
 
-    @json
+        return stream_json_list(user_deal_to_dict(market, deal) for deal in response['records'])
+
+    @action(content_type='application/json')
     @validate_form(whitelist=['limit', 'lastId', 'offset'])
     def peek(self, market: str, inner_resource: str):
 
@@ -68,38 +168,19 @@ class MarketController(RestController):
             except StexchangeException as e:
                 raise stexchange_http_exception_handler(e)
 
-            return [
-                {
-                    'id': deal['id'],
-                    'time': format_iso_datetime(
-                        datetime.utcfromtimestamp(int(deal['time']))) if 'time' in deal else None,
-                    'price': market.quote_currency.normalized_to_output(deal['price']),
-                    'amount': market.base_currency.normalized_to_output(deal['amount']),
-                    'type': deal['type'],
-                } for deal in response
-            ]
+            return stream_json_list(market_deal_to_dict(market, deal) for deal in response)
+        else:
+            raise HttpBadRequest('Bad inner resource', 'bad-inner-resource')
 
     @json
     @prevent_form
     def list(self):
         try:
-            response = stexchange_client.market_list()
-            supporting_markets = Market.query.all()
+            response = market_data_cache.call('market_list')
         except StexchangeException as e:
             raise stexchange_http_exception_handler(e)
 
-        return [
-            {
-                'name': market['name'],
-                'stock': market['stock'],
-                'stockPrec': market['stock_prec'],
-                'money': market['money'],
-                'feePrec': market['fee_prec'],
-                'minAmount': list(filter(lambda y: y.name == market['name'], supporting_markets))[0]
-                    .base_currency.normalized_to_output(market['min_amount']),
-                'moneyPrec': market['money_prec'],
-            } for market in response if any(market['name'] == sm.name for sm in supporting_markets)
-        ]
+        return market_list_to_dict(response, metadata_registry.get_market)
 
     @json
     @prevent_form
@@ -108,10 +189,7 @@ class MarketController(RestController):
         market = self.__fetch_market(market_name)
 
         try:
-            return {
-                'name': market.name,
-                'price': market.quote_currency.normalized_to_output(stexchange_client.market_last(market.name)),
-            }
+            return last_to_dict(market, market_data_cache.call('market_last', market.name))
         except StexchangeException as e:
             raise stexchange_http_exception_handler(e)
 
@@ -122,7 +200,7 @@ class MarketController(RestController):
         market = self.__fetch_market(market_name)
 
         try:
-            response = stexchange_client.market_summary(market_name)
+            response = market_data_cache.call('market_summary', market.name)
         except StexchangeException as e:
             raise stexchange_http_exception_handler(e)
 
@@ -145,23 +223,13 @@ class MarketController(RestController):
 
         try:
             if period == 'today':
-                status = stexchange_client.market_status_today(market.name)
+                status = market_data_cache.call('market_status_today', market.name)
             else:
-                status = stexchange_client.market_status(market.name, int(period))
+                status = market_data_cache.call('market_status', market.name, int(period))
         except StexchangeException as e:
             raise stexchange_http_exception_handler(e)
 
-        return {
-            'open': market.quote_currency.normalized_to_output(status['open']),
-            'high': market.quote_currency.normalized_to_output(status['high']),
-            'low': market.quote_currency.normalized_to_output(status['low']),
-            'close': market.quote_currency.normalized_to_output(status.get('close', None)),
-            'volume': market.base_currency.normalized_to_output(status['volume']),
-            # FIXME: Is it (base_currency) right?
-            'deal': market.quote_currency.normalized_to_output(status['deal']),  # FIXME: Is it (quote_currency) right?
-            'last': market.quote_currency.normalized_to_output(status['last']),
-            'period': status.get('period', None),
-        }
+        return status_to_dict(market, status)
 
     @json
     @validate_form(
@@ -177,7 +245,7 @@ class MarketController(RestController):
         market = self.__fetch_market(market_name)
 
         try:
-            result = stexchange_client.order_book(market.name, side, offset, limit)
+            result = market_data_cache.call('order_book', market.name, side, offset, limit)
         except StexchangeException as e:
             raise stexchange_http_exception_handler(e)
 
@@ -204,20 +272,13 @@ class MarketController(RestController):
         market = self.__fetch_market(market_name)
 
         try:
-            depth = stexchange_client.order_depth(market.name, limit, interval)
+            depth = market_data_cache.call('order_depth', market.name, limit, interval)
         except StexchangeException as e:
             raise stexchange_http_exception_handler(e)
 
-        return {
-            'asks': [{'price': market.quote_currency.normalized_to_output(ask[0]),
-                      'amount': market.base_currency.normalized_to_output(ask[1])} for ask in
-                     depth['asks']],
-            'bids': [{'price': market.quote_currency.normalized_to_output(bid[0]),
-                      'amount': market.base_currency.normalized_to_output(bid[1])} for bid in
-                     depth['bids']],
-        }
+        return depth_to_dict(market, depth)
 
-    @json
+    @action(content_type='application/json')
     @validate_form(
         exact=['interval', 'start', 'end'], types={'interval': int, 'start': int, 'end': int}
     )
@@ -229,17 +290,10 @@ class MarketController(RestController):
         market = self.__fetch_market(market_name)
 
         try:
-            kline = stexchange_client.market_kline(market.name, start, end, interval)
+            kline = kline_store.get(market.name, start, end, interval)
+        except KlineRangeException:
+            raise HttpBadRequest('Too many candles', 'too-many-candles')
         except StexchangeException as e:
             raise stexchange_http_exception_handler(e)
 
-        return [{
-            'market': market.name,
-            'time': k[0],
-            'o': market.quote_currency.normalized_to_output(k[1]),
-            'h': market.quote_currency.normalized_to_output(k[3]),
-            'l': market.quote_currency.normalized_to_output(k[4]),
-            'c': market.quote_currency.normalized_to_output(k[2]),
-            'volume': market.base_currency.normalized_to_output(k[5]),  # FIXME: Is it (base_currency) right?
-            'amount': market.base_currency.normalized_to_output(k[6]),  # FIXME: Is it (base_currency) right?
-        } for k in kline]
+        return stream_json_list(iter_kline_to_dict(market, kline), chunk_size=KLINE_CHUNK_SIZE)
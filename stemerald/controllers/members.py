@@ -168,6 +168,7 @@ class EvidenceController(ModelRestController):
 
         client.evidence.error = None
         client.is_evidence_verified = True
+        context.application.__authenticator__.forget_member_claims_after_commit(client.id)
 
         return client
 
@@ -588,6 +589,7 @@ class ClientController(ModelRestController):
             raise HttpConflict()
 
         client.is_active = True
+        context.application.__authenticator__.forget_member_claims_after_commit(client.id)
 
         return client
 
@@ -1,9 +1,11 @@
 from nanohttp import json, context, HttpNotFound
 from restfulpy.authorization import authorize
 from restfulpy.controllers import ModelRestController
+from restfulpy.orm import commit, DBSession
 from restfulpy.validation import validate_form, prevent_form
+from sqlalchemy import or_
 
-from stemerald.models import Notification
+from stemerald.models import Notification, BroadcastNotification
 
 
 class NotificationController(ModelRestController):
@@ -23,25 +25,52 @@ class NotificationController(ModelRestController):
         query = Notification.query
 
         if context.identity.is_in_roles('client'):
-            query = query.filter(Notification.member_id == context.identity.id)
+            query = query.filter(or_(
+                Notification.member_id == context.identity.id,
+                Notification.type == BroadcastNotification.__mapper_args__['polymorphic_identity']
+            ))
 
         return query
 
+    @json
+    @authorize('admin')
+    @validate_form(exact=['title', 'description'])
+    @Notification.expose
+    @commit
+    def create(self):
+        """
+        Broadcasts a notification to all of the members.
+        """
+        notification = BroadcastNotification(
+            title=context.form['title'],
+            description=context.form['description'],
+        )
+        DBSession.add(notification)
+        return notification
+
     @json
     @authorize('admin', 'client')
     @prevent_form
     @Notification.expose
+    @commit
     def read(self, notification_id: int = None):
         query = Notification.query.filter(Notification.id == notification_id)
 
         if context.identity.is_in_roles('client'):
-            query = query.filter(Notification.member_id == context.identity.id)
+            query = query.filter(or_(
+                Notification.member_id == context.identity.id,
+                Notification.type == BroadcastNotification.__mapper_args__['polymorphic_identity']
+            ))
 
         notification = query.one_or_none()
         if notification is None:
             raise HttpNotFound('Notification not found', 'notification-not-found')
 
-        if notification.is_read is False:
+        if isinstance(notification, BroadcastNotification):
+            if context.identity.is_in_roles('client'):
+                notification.mark_as_read(context.identity.id)
+
+        elif notification.is_read is False:
             notification.is_read = True
 
         return notification
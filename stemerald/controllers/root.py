@@ -1,5 +1,5 @@
 from restfulpy.authorization import authorize
-from restfulpy.orm import commit
+from restfulpy.orm import commit, DBSession
 from restfulpy.validation import validate_form
 
 from stemerald.controllers.assets import AssetsController, BalancesController
@@ -11,12 +11,18 @@ from restfulpy.controllers import RootController, ModelRestController
 
 import stemerald
 from stemerald.controllers.wallet import DepositController, WithdrawController
+from stemerald.controllers.webhooks import StawalletHookController
 from stemerald.models import Currency
 from stemerald.controllers.security import LogController, IpWhitelistController
 from stemerald.controllers.members import ClientController, AdminController, SessionController
 from stemerald.controllers.tickets import TicketController
 from stemerald.controllers.trading import OrderController
 from stemerald.controllers.market import MarketController
+from stemerald.controllers.notifications import NotificationController
+from stemerald.cache import market_data_cache
+from stemerald.helpers import call_after_commit
+from stemerald.registry import metadata_registry
+from stemerald.stexchange import stexchange_client
 
 
 # noinspection PyUnresolvedReferences
@@ -46,6 +52,7 @@ class CurrencyController(ModelRestController):
             raise HttpNotFound()
 
         currency.update_from_request()
+        call_after_commit(DBSession, metadata_registry.invalidate)
         return currency
 
 
@@ -62,6 +69,7 @@ class ApiV2(Controller):
 
     # Support
     tickets = TicketController()
+    notifications = NotificationController()
 
     # Base
     currencies = CurrencyController()  # TODO
@@ -90,6 +98,15 @@ class ApiV2(Controller):
             'version': stemerald.__version__
         }
 
+    @json
+    @authorize('admin')
+    def metrics(self):
+        # Note: These numbers are per worker process
+        return {
+            'stexchange': stexchange_client.pool_stats(),
+            'marketCache': market_data_cache.stats(),
+        }
+
 
 class Root(RootController):
     apiv2 = ApiV2()
@@ -97,3 +114,4 @@ class Root(RootController):
 
 setattr(ApiV2, 'bank-cards', BankCardController())
 setattr(ApiV2, 'bank-accounts', BankAccountController())
+setattr(ApiV2, 'stawallet-hooks', StawalletHookController())
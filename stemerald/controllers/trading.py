@@ -7,7 +7,9 @@ from restfulpy.authorization import authorize
 from restfulpy.utils import format_iso_datetime
 from restfulpy.validation import validate_form
 
+from stemerald.cache import balance_cache
 from stemerald.models import Market, Currency
+from stemerald.registry import metadata_registry
 from stemerald.stexchange import stexchange_client, StexchangeException, stexchange_http_exception_handler
 
 BidId = Union[int, str]
@@ -35,12 +37,32 @@ def order_to_dict(market: Market, o):
     }
 
 
+def orders_to_dict(market: Market, orders):
+    return [order_to_dict(market, o) for o in orders]
+
+
+def deal_to_dict(market: Market, d):
+    return {
+        'id': d['id'],
+        'time': format_iso_datetime(datetime.utcfromtimestamp(int(d['time']))) if 'time' in d else None,
+        'user': d['user'],
+        'role': 'maker' if d['role'] == 1 else 'taker',
+        'amount': market.base_currency.normalized_to_output(d['amount']),
+        'price': market.quote_currency.normalized_to_output(d['price']),
+        'deal': market.quote_currency.normalized_to_output(d['deal']),  # FIXME: Is it (quote_currency)
+        'fee': market.quote_currency.normalized_to_output(d['fee']),  # FIXME: Is it (quote_currency)
+        'orderId': d['deal_order_id'],
+    }
+
+
+def deals_to_dict(market: Market, deals):
+    return [deal_to_dict(market, d) for d in deals]
+
+
 class OrderController(RestController):
 
     def __fetch_market(self):
-        market = Market.query \
-            .filter(Market.name == context.query_string.get("marketName")) \
-            .one_or_none()
+        market = metadata_registry.get_market(context.query_string.get("marketName"))
 
         if market is None:
             raise HttpBadRequest('Bad marketName')
@@ -86,7 +108,7 @@ class OrderController(RestController):
                 else:
                     raise HttpNotFound('Bad status.')
 
-                return [order_to_dict(self.__fetch_market(), order) for order in orders['records']]
+                return orders_to_dict(self.__fetch_market(), orders['records'])
 
             else:
                 if context.query_string['status'] == 'pending':
@@ -124,6 +146,7 @@ class OrderController(RestController):
                 market=context.query_string['marketName'],
                 order_id=int(order_id),
             )
+            balance_cache.invalidate(client_id)
 
             return order_to_dict(self.__fetch_market(), order)
 
@@ -148,7 +171,7 @@ class OrderController(RestController):
     def create(self):
         client_id = context.identity.id
 
-        market = Market.query.filter(Market.name == context.form['marketName']).one_or_none()
+        market = metadata_registry.get_market(context.form['marketName'])
         if market is None:
             raise HttpBadRequest('Market not found', 'market-not-found')
 
@@ -188,6 +211,7 @@ class OrderController(RestController):
             else:
                 raise HttpNotFound('Bad status.')
 
+            balance_cache.invalidate(client_id)
             return order_to_dict(market, order)
 
         except StexchangeException as e:
@@ -222,19 +246,13 @@ class OrderController(RestController):
                 limit=limit
             )
 
-            market = self.__fetch_market()
-            return [{
-                'id': deal['id'],
-                'time': format_iso_datetime(
-                    datetime.utcfromtimestamp(int(deal['time']))) if 'time' in deal else None,
-                'user': deal['user'],
-                'role': 'maker' if deal['role'] == 1 else 'taker',
-                'amount': market.base_currency.normalized_to_output(deal['amount']),
-                'price': market.quote_currency.normalized_to_output(deal['price']),
-                'deal': market.quote_currency.normalized_to_output(deal['deal']),  # FIXME: Is it (quote_currency)
-                'fee': market.quote_currency.normalized_to_output(deal['fee']),  # FIXME: Is it (quote_currency)
-                'orderId': deal['deal_order_id'],
-            } for deal in deals['records'] if (context.identity.is_in_roles('admin') or (deal['user'] == client_id))]
+            return deals_to_dict(
+                self.__fetch_market(),
+                [
+                    deal for deal in deals['records']
+                    if context.identity.is_in_roles('admin') or deal['user'] == client_id
+                ]
+            )
 
         except StexchangeException as e:
             raise stexchange_http_exception_handler(e)
@@ -10,7 +10,9 @@ from restfulpy.controllers import ModelRestController
 from restfulpy.logging_ import get_logger
 from restfulpy.validation import validate_form, prevent_form
 
+from stemerald.cache import balance_cache
 from stemerald.models import *
+from stemerald.registry import metadata_registry
 from stemerald.shaparak import create_shaparak_provider, ShaparakError
 from stemerald.stexchange import StexchangeException, stexchange_http_exception_handler, stexchange_client
 
@@ -33,16 +35,13 @@ class ShaparakInController(ModelRestController):
         shetab_address_id = context.form.get('shetabAddressId')
 
         # Check deposit range
-        payment_gateway = PaymentGateway.query.filter(
-            PaymentGateway.name == context.form.get('paymentGatewayName')
-        ).one_or_none()
-
-        amount = payment_gateway.fiat.input_to_normalized(amount)
+        payment_gateway = metadata_registry.get_payment_gateway(context.form.get('paymentGatewayName'))
 
         # TODO: More strict check and review how we control payment gateways
         if (payment_gateway is None) or (payment_gateway.fiat_symbol not in ['IRR', 'TIRR']):
             raise HttpBadRequest('Bad payment gateway')
-        Fiat.query.filter(Fiat.symbol == payment_gateway.fiat_symbol).one()
+
+        amount = payment_gateway.fiat.input_to_normalized(amount)
 
         if (payment_gateway.cashin_max != Decimal(0) and amount > payment_gateway.cashin_max) \
                 or amount < payment_gateway.cashin_min:
@@ -146,6 +145,7 @@ class ShaparakInController(ModelRestController):
                                     ),
                                     detail=target_transaction.to_dict(),
                                 )
+                                balance_cache.invalidate(target_transaction.member_id)
 
                                 # FIXME: Important !!!! : rollback the updated balance if
                                 #  DBSession.commit() was not successful
@@ -185,16 +185,13 @@ class ShaparakOutController(ModelRestController):
         sheba_address_address_id = context.form.get('shebaAddressId')
 
         # Check cashout range
-        payment_gateway = PaymentGateway.query.filter(
-            PaymentGateway.name == context.form.get('paymentGatewayName')
-        ).one()
-
-        amount = payment_gateway.fiat.input_to_normalized(amount)
+        payment_gateway = metadata_registry.get_payment_gateway(context.form.get('paymentGatewayName'))
 
         # TODO: More strict check and review how we control payment gateways
         if (payment_gateway is None) or (payment_gateway.fiat_symbol not in ['IRR', 'TIRR']):
             raise HttpBadRequest('Bad payment gateway')
-        Fiat.query.filter(Fiat.symbol == payment_gateway.fiat_symbol).one()
+
+        amount = payment_gateway.fiat.input_to_normalized(amount)
 
         if (payment_gateway.cashout_max != Decimal(0) and amount > payment_gateway.cashout_max) or \
                 amount < payment_gateway.cashout_min:
@@ -246,6 +243,7 @@ class ShaparakOutController(ModelRestController):
                 # FIXME Prevent negative amounts
                 detail=shaparak_out.to_dict(),
             )
+            balance_cache.invalidate(shaparak_out.member_id)
             # FIXME: Important !!!! : rollback the updated balance if
             #  DBSession.commit() was not successful
         except StexchangeException as e:
@@ -307,6 +305,7 @@ class ShaparakOutController(ModelRestController):
                 change=payment_gateway.fiat.format_normalized_string(shaparak_out.amount),
                 detail=shaparak_out.to_dict(),
             )
+            balance_cache.invalidate(shaparak_out.member_id)
             # FIXME: Important !!!! : rollback the updated balance if
             #  DBSession.commit() was not successful
         except StexchangeException as e:
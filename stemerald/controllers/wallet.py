@@ -1,11 +1,18 @@
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from decimal import Decimal
 
-from nanohttp import RestController, json, context, HttpNotFound, HttpBadRequest, HttpInternalServerError
+from nanohttp import RestController, json, context, HttpNotFound, HttpBadRequest, HttpInternalServerError, settings
 from restfulpy.authorization import authorize
 from restfulpy.logging_ import get_logger
 from restfulpy.validation import validate_form
 
+from stemerald.cache import balance_cache
 from stemerald.models import Cryptocurrency
+from stemerald.registry import metadata_registry
 from stemerald.stawallet import stawallet_client, StawalletException, StawalletHttpException
 from stemerald.stexchange import StexchangeException, stexchange_client, BalanceNotEnoughException, \
     RepeatUpdateException
@@ -33,6 +40,81 @@ def deposit_to_dict(currency:Cryptocurrency, deposit):
     }
 
 
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def _get_wallets_executor():
+    # Per process, the threads are not inherited by the forked workers
+    pid = os.getpid()
+    executor = _executors.get(pid)
+    if executor is None:
+        with _executors_lock:
+            executor = _executors.get(pid)
+            if executor is None:
+                executor = _executors[pid] = ThreadPoolExecutor(
+                    max_workers=settings.stawallet.pool_size,
+                    thread_name_prefix='wallets'
+                )
+    return executor
+
+
+def fetch_from_all_wallets(fetch):
+    """
+    Calls `fetch(cryptocurrency)` for all of the cryptocurrencies concurrently, so it takes as long as the slowest
+    wallet, not the sum of them.
+
+    :return: [(cryptocurrency, result), ...], without the wallets which are not accessible
+    """
+    executor = _get_wallets_executor()
+    futures = [
+        (cryptocurrency, executor.submit(fetch, cryptocurrency))
+        for cryptocurrency in metadata_registry.currencies
+        if isinstance(cryptocurrency, Cryptocurrency)
+    ]
+
+    results = []
+    for cryptocurrency, future in futures:
+        try:
+            results.append((cryptocurrency, future.result()))
+        except StawalletException as e:
+            logger.info(f'Wallet access error ({cryptocurrency.wallet_id}): {e.message}')
+
+    return results
+
+
+ISO_DATETIME_PATTERN = re.compile(
+    r'^(\d{4}-\d{2}-\d{2})[T ](\d{2}:\d{2}:\d{2})(?:\.(\d+))?(Z|[+-]\d{2}:?\d{2})?$'
+)
+
+
+def _time_key(value):
+    """
+    The timestamp of an ISO 8601 time (the wallets may be in different time zones), 0 if it is not one. The times
+    without an offset are taken as UTC.
+    """
+    # `datetime.fromisoformat` and the `%z` of `strptime` accepting `+03:00` are not available before python 3.7
+    match = ISO_DATETIME_PATTERN.match(value) if isinstance(value, str) else None
+    if match is None:
+        return 0
+
+    date, time_, fraction, offset = match.groups()
+    if offset is None or offset == 'Z':
+        tz = timezone.utc
+    else:
+        digits = offset[1:].replace(':', '')
+        delta = timedelta(hours=int(digits[:2]), minutes=int(digits[2:]))
+        tz = timezone(-delta if offset[0] == '-' else delta)
+
+    try:
+        stamp = datetime.strptime(f'{date} {time_}', '%Y-%m-%d %H:%M:%S')
+    except ValueError:
+        return 0
+
+    microsecond = int((fraction or '0')[:6].ljust(6, '0'))
+    return stamp.replace(microsecond=microsecond, tzinfo=tz).timestamp()
+
+
 def invoice_to_dict(invoice):
     return {
         'id': invoice['id'],
@@ -47,9 +129,10 @@ def invoice_to_dict(invoice):
 class DepositController(RestController):
 
     def __fetch_cryptocurrency(self):
-        cryptocurrency = Cryptocurrency.query \
-            .filter(Cryptocurrency.symbol == context.query_string.get("cryptocurrencySymbol")) \
-            .one_or_none()
+        cryptocurrency = metadata_registry.get_currency(
+            context.query_string.get("cryptocurrencySymbol"),
+            type_=Cryptocurrency
+        )
 
         if cryptocurrency is None:
             raise HttpBadRequest('Bad cryptocurrencySymbol')
@@ -73,6 +156,33 @@ class DepositController(RestController):
             logger.info('Wallet access error: ' + e.message)
             raise HttpInternalServerError("Wallet access error")
 
+    @json
+    @authorize('semitrusted_client', 'trusted_client')
+    @validate_form(whitelist=['page'], types={'page': int})
+    def overview(self):
+        """
+        The deposits of all of the cryptocurrencies, newest first. The deposits have no time of their own, so they
+        are ordered by the time of their invoices.
+
+        The `page` is passed to each one of the wallets, so it is the merge of the `page` of each wallet, not the
+        `page` of the merged timeline: a newer deposit of a busy wallet may come in a later page than an older one of
+        the others. The pages should be fetched until an empty one.
+        """
+        user_id = context.identity.id
+        page = context.query_string.get('page', 0)
+
+        results = []
+        for cryptocurrency, deposits in fetch_from_all_wallets(
+                lambda c: stawallet_client.get_deposits(wallet_id=c.wallet_id, user_id=user_id, page=page)
+        ):
+            for deposit in deposits or []:
+                deposit = deposit_to_dict(cryptocurrency, deposit)
+                deposit['cryptocurrencySymbol'] = cryptocurrency.symbol
+                results.append(deposit)
+
+        results.sort(key=lambda d: (_time_key(d['invoice']['creation']), d['id']), reverse=True)
+        return results
+
     @json
     @authorize('semitrusted_client', 'trusted_client')
     @validate_form(exact=['cryptocurrencySymbol'])
@@ -153,10 +263,10 @@ def withdraw_to_dict(currency: Cryptocurrency, withdraw):
 class WithdrawController(RestController):
 
     def __fetch_cryptocurrency(self):
-        cryptocurrency = Cryptocurrency.query \
-            .filter(Cryptocurrency.symbol ==
-                    context.form.get("cryptocurrencySymbol", context.query_string.get("cryptocurrencySymbol"))) \
-            .one_or_none()
+        cryptocurrency = metadata_registry.get_currency(
+            context.form.get("cryptocurrencySymbol", context.query_string.get("cryptocurrencySymbol")),
+            type_=Cryptocurrency
+        )
 
         if cryptocurrency is None:
             raise HttpBadRequest('Bad cryptocurrencySymbol')
@@ -179,6 +289,31 @@ class WithdrawController(RestController):
         except StawalletException as e:
             raise HttpInternalServerError("Wallet access error")
 
+    @json
+    @authorize('semitrusted_client', 'trusted_client')
+    @validate_form(whitelist=['page'], types={'page': int})
+    def overview(self):
+        """
+        The withdraws of all of the cryptocurrencies, newest first.
+
+        The `page` is passed to each one of the wallets, so it is the merge of the `page` of each wallet, not the
+        `page` of the merged timeline (see `DepositController.overview`).
+        """
+        user_id = context.identity.id
+        page = context.query_string.get('page', 0)
+
+        results = []
+        for cryptocurrency, withdraws in fetch_from_all_wallets(
+                lambda c: stawallet_client.get_withdraws(wallet_id=c.wallet_id, user_id=user_id, page=page)
+        ):
+            for withdraw in withdraws or []:
+                withdraw = withdraw_to_dict(cryptocurrency, withdraw)
+                withdraw['cryptocurrencySymbol'] = cryptocurrency.symbol
+                results.append(withdraw)
+
+        results.sort(key=lambda w: _time_key(w['issuedAt']), reverse=True)
+        return results
+
     @json
     @authorize('semitrusted_client', 'trusted_client')
     @validate_form(exact=['cryptocurrencySymbol'])
@@ -246,6 +381,7 @@ class WithdrawController(RestController):
                 change=f'-{amount + withdrawal_fee}',
                 detail=withdraw_quote,  # FIXME
             )
+            balance_cache.invalidate(context.identity.id)
 
         except BalanceNotEnoughException as e:
             raise HttpBadRequest('Balance not enough', 'not-enough-balance')
@@ -0,0 +1,80 @@
+import hmac
+
+from nanohttp import Controller, json, context, settings, HttpBadRequest, HttpForbidden, HttpNotFound, \
+    HttpInternalServerError
+from restfulpy.logging_ import get_logger
+from restfulpy.orm import commit, DBSession
+
+from stemerald.deposits import credit_deposit
+from stemerald.models import Cryptocurrency
+from stemerald.stawallet import stawallet_client, StawalletException, StawalletHttpException
+from stemerald.stexchange import StexchangeException, stexchange_http_exception_handler
+
+logger = get_logger('STAWALLET_HOOKS')
+
+
+class StawalletHookController(Controller):
+    """
+    Stawallet pushes the deposit events here (as json), authenticated by the shared `stawallet.webhook_secret` in
+    the `X-Stawallet-Secret` header:
+
+        POST /apiv2/stawallet-hooks/deposits
+        {"walletId": "BTC", "depositId": 1}
+
+    The event is just a notification: the deposit itself is fetched from stawallet, so the body (which may also be
+    the whole deposit, `{"walletId": "BTC", "deposit": {"id": 1, ...}}`) is never trusted for the user or the amount.
+
+    A non-2xx response means the event should be pushed again, anyway the wallet sync looper will reconcile it later.
+    """
+
+    @staticmethod
+    def _authenticate():
+        secret = settings.stawallet.webhook_secret
+        if not secret:
+            # Not enabled
+            raise HttpNotFound()
+
+        if not hmac.compare_digest(context.environ.get('HTTP_X_STAWALLET_SECRET', '').encode(), secret.encode()):
+            raise HttpForbidden()
+
+    @json(verbs=['post'])
+    @commit
+    def deposits(self):
+        self._authenticate()
+
+        wallet_id = context.form.get('walletId')
+        deposit_id = context.form.get('depositId')
+        if deposit_id is None and isinstance(context.form.get('deposit'), dict):
+            deposit_id = context.form['deposit'].get('id')
+
+        try:
+            deposit_id = int(deposit_id)
+        except (TypeError, ValueError):
+            raise HttpBadRequest('Bad deposit event', 'bad-deposit-event')
+
+        if not wallet_id:
+            raise HttpBadRequest('Bad deposit event', 'bad-deposit-event')
+
+        cryptocurrency = Cryptocurrency.query.filter(Cryptocurrency.wallet_id == wallet_id).one_or_none()
+        if cryptocurrency is None:
+            raise HttpBadRequest('Bad walletId', 'bad-wallet-id')
+
+        try:
+            deposit = stawallet_client.get_deposit(wallet_id=cryptocurrency.wallet_id, deposit_id=deposit_id)
+        except StawalletHttpException as e:
+            if e.http_status_code == 404:
+                raise HttpBadRequest('Bad depositId', 'bad-deposit-id')
+            logger.info('Wallet access error: ' + e.message)
+            raise HttpInternalServerError('Wallet access error')
+        except StawalletException as e:
+            logger.info('Wallet access error: ' + e.message)
+            raise HttpInternalServerError('Wallet access error')
+
+        try:
+            credit_deposit(DBSession, cryptocurrency, deposit)
+        except StexchangeException as e:
+            raise stexchange_http_exception_handler(e)
+        except (KeyError, TypeError, ValueError):
+            raise HttpBadRequest('Bad deposit event', 'bad-deposit-event')
+
+        return {'id': deposit['id']}
@@ -0,0 +1,180 @@
+import functools
+from decimal import getcontext
+
+import redis
+from restfulpy.logging_ import get_logger
+from restfulpy.taskqueue import Task
+
+from stemerald.cache import redis_client, balance_cache
+from stemerald.controllers.wallet import deposit_to_dict
+from stemerald.helpers import call_after_commit
+from stemerald.models import Cryptocurrency, Notification
+from stemerald.stexchange import RepeatUpdateException, stexchange_client
+
+logger = get_logger('DEPOSITS')
+
+NOTIFIED_DEPOSIT_EVENT_TTL = 7 * 24 * 3600  # Seconds
+
+
+def _notified_key(cryptocurrency: Cryptocurrency, deposit):
+    return f'deposit-notified:{cryptocurrency.wallet_id}:{deposit["id"]}:{deposit["status"]}:' \
+        f'{deposit["isConfirmed"]}:{deposit["confirmationsLeft"]}'
+
+
+def _get_notified(keys):
+    if not keys:
+        return set()
+
+    try:
+        return {key for key, notified in zip(keys, redis_client.mget(keys)) if notified is not None}
+    except redis.RedisError:
+        logger.exception('Cannot check whether the deposit events are already notified')
+        return set()
+
+
+def _mark_notified(key):
+    try:
+        redis_client.set(key, 1, ex=NOTIFIED_DEPOSIT_EVENT_TTL)
+    except redis.RedisError:
+        logger.exception('Cannot mark the deposit event as notified')
+
+
+def _notification_row(cryptocurrency: Cryptocurrency, deposit, change_amount_output):
+    row = dict(member_id=int(deposit['user']))
+
+    if deposit['isConfirmed'] is True:
+        row['title'] = 'Your balance has been increased'
+        row['description'] = f'Your new deposit has just completely confirmed. ' \
+            f'You balance has been increased ' \
+            f'{change_amount_output} {cryptocurrency.wallet_id} '
+
+    elif deposit['status'].lower() == 'orphan':
+        row['title'] = 'New deposit discovered'
+        row['description'] = f'Your new deposit has just been found. ' \
+            f'Please be patient for your transaction to be mined and get ' \
+            f'{deposit["confirmationsLeft"]} more confirmations '
+
+    else:
+        row['title'] = 'New deposit in the way'
+        row['description'] = f'Your new deposit has just got it\'s first ' \
+            f'confirmation. You will have full access to it as soon as it receives ' \
+            f'{deposit["confirmationsLeft"]} more confirmations '
+
+    return row
+
+
+def _column_defaults(table):
+    """
+    The (python-side) defaults of the columns of `table`, evaluated once, as the ORM would do for each row.
+    """
+    defaults = {}
+    for column in table.columns:
+        default = column.default
+        if default is None or default.is_sequence or default.is_clause_element:
+            continue
+        defaults[column.name] = default.arg(None) if default.is_callable else default.arg
+
+    return defaults
+
+
+def insert_notifications(session, rows):
+    """
+    Inserts the notifications (dicts of the `Notification` columns, except the ones of `Task`) using one multi-row
+    INSERT per table, instead of one per row using the ORM.
+    """
+    if not rows:
+        return
+
+    task_table = Task.__table__
+    notification_table = Notification.__table__
+    task_defaults = _column_defaults(task_table)
+    notification_defaults = _column_defaults(notification_table)
+
+    task_ids = session.execute(
+        task_table.insert()
+            .values([dict(task_defaults, type=Notification.__tablename__) for __ in rows])
+            .returning(task_table.c.id)
+    ).fetchall()
+
+    # The ids are given in the order of the rows
+    session.execute(
+        notification_table.insert().values([
+            dict(notification_defaults, **row, id=task_id) for (task_id, ), row in zip(task_ids, rows)
+        ])
+    )
+
+
+def credit_deposits(session, cryptocurrency: Cryptocurrency, deposits):
+    """
+    The crediting pipeline of the (raw) stawallet deposits, shared between the wallet sync looper and the stawallet
+    webhook. The balance updates are sent in one batch, and the notifications are inserted in bulk; the caller
+    should commit the session.
+
+    The same deposit may come in more than once:
+
+        * The balance update is idempotent, the engine rejects a repeated `business_id`.
+        * The notification of each state of the deposit is sent once, it is remembered after the commit.
+
+    """
+    getcontext().prec = 8
+    credits = []
+    with stexchange_client.batch() as batch:
+        for deposit in deposits:
+            change_amount_normalized = cryptocurrency.smallest_unit_to_normalized(deposit['netAmount'])
+            change_amount_output = cryptocurrency.smallest_unit_to_output(deposit['netAmount'])
+            deposit = deposit_to_dict(cryptocurrency, deposit)
+
+            # TODO: Check the range
+            # TODO: Calculate the commission
+            # TODO: Check the purpose (e.g. be 'deposit', not 'charge')
+
+            if deposit['user'] is None:
+                # FIXME: Unknown (or 'charge')
+                # TODO: Inform and handle
+                continue
+
+            balance_update = None
+            if deposit['isConfirmed'] is True and deposit['error'] is None:
+                # TODO: Check whether the user is admin (charge) or user (deposit)?
+                balance_update = batch.balance_update(
+                    user_id=int(deposit['user']),
+                    asset=cryptocurrency.wallet_id,
+                    business='deposit',  # TODO: Are you sure?
+                    business_id=int(deposit['id']),  # TODO: Are you sure?
+                    change=change_amount_normalized,
+                    # TODO: Make sure is greater than 0
+                    detail={}  # TODO
+                )
+
+            credits.append((deposit, change_amount_output, balance_update))
+
+    balance_cache.invalidate(*{
+        int(deposit['user']) for deposit, __, balance_update in credits if balance_update is not None
+    })
+
+    credited = []
+    for deposit, change_amount_output, balance_update in credits:
+        if balance_update is not None and balance_update.error is not None:
+            if isinstance(balance_update.error, RepeatUpdateException):
+                # TODO: Log
+                continue
+            raise balance_update.error
+
+        credited.append((_notified_key(cryptocurrency, deposit), deposit, change_amount_output))
+
+    notified_keys = _get_notified([key for key, __, __ in credited])
+    notifications = []
+    for notified_key, deposit, change_amount_output in credited:
+        if notified_key in notified_keys:
+            continue
+
+        # TODO: Notify the user
+        notifications.append(_notification_row(cryptocurrency, deposit, change_amount_output))
+        notified_keys.add(notified_key)
+        call_after_commit(session, functools.partial(_mark_notified, notified_key))
+
+    insert_notifications(session, notifications)
+
+
+def credit_deposit(session, cryptocurrency: Cryptocurrency, deposit):
+    credit_deposits(session, cryptocurrency, [deposit])
@@ -1,12 +1,15 @@
-from firebase_admin import App
+from firebase_admin import App, messaging
 from nanohttp import settings
 import argparse
 import json
-import requests
+import threading
+import time
 
 from oauth2client.service_account import ServiceAccountCredentials
 from restfulpy.logging_ import get_logger
 
+from stemerald.helpers import create_pooled_session
+
 logger = get_logger('FIREBASE')
 
 
@@ -29,6 +32,66 @@ class FirebaseClient:
         return self._firebase_client
 
 
+MULTICAST_MAX_TOKENS = 500
+
+# Errors meaning the token will never work again, so should not be retried
+STALE_TOKEN_ERRORS = tuple(
+    filter(None, (getattr(messaging, name, None) for name in ('UnregisteredError', 'SenderIdMismatchError')))
+)
+STALE_TOKEN_ERROR_CODES = {'registration-token-not-registered', 'mismatched-credential'}
+
+
+def _is_stale_token_error(error):
+    return isinstance(error, STALE_TOKEN_ERRORS) or getattr(error, 'code', None) in STALE_TOKEN_ERROR_CODES
+
+
+def send_to_topic(topic, title, body):
+    """
+    Sends a notification to all of the devices subscribed to the FCM `topic`, with a single call.
+    """
+    response = messaging.send(messaging.Message(
+        notification=messaging.Notification(title=title, body=body),
+        topic=topic,
+    ))
+    logger.info(f'Successfully sent message: {response} to topic: {topic}')
+    return response
+
+
+def send_multicast(tokens, title, body):
+    """
+    Sends a notification to the `tokens`, `MULTICAST_MAX_TOKENS` per call, using the batch send API of FCM.
+
+    :return: The set of the stale tokens (which should not be used anymore)
+    """
+    # `send_each_for_multicast` replaces `send_multicast` in the newer versions of `firebase_admin`
+    send = getattr(messaging, 'send_each_for_multicast', None) or messaging.send_multicast
+
+    tokens = list(tokens)
+    stale_tokens = set()
+    for i in range(0, len(tokens), MULTICAST_MAX_TOKENS):
+        chunk = tokens[i:i + MULTICAST_MAX_TOKENS]
+        try:
+            batch_response = send(messaging.MulticastMessage(
+                notification=messaging.Notification(title=title, body=body),
+                tokens=chunk,
+            ))
+        except Exception:
+            logger.exception(f'Error while sending to {len(chunk)} devices')
+            continue
+
+        logger.info(f'Successfully sent to {batch_response.success_count} of {len(chunk)} devices')
+        for token, response in zip(chunk, batch_response.responses):
+            if response.success:
+                continue
+
+            if _is_stale_token_error(response.exception):
+                stale_tokens.add(token)
+            else:
+                logger.info(f'Error while sending to device: {token}: {response.exception}')
+
+    return stale_tokens
+
+
 """Server Side FCM sample.
 Firebase Cloud Messaging (FCM) can be used to send messages to clients on iOS,
 Android and Web.
@@ -45,15 +108,63 @@ FCM_URL = BASE_URL + '/' + FCM_ENDPOINT
 SCOPES = ['https://www.googleapis.com/auth/firebase.messaging']
 
 
+class AccessTokenCache:
+    """
+    A process-wide cache of the OAuth access token of the service account, refreshed `refresh_margin` seconds
+    before it expires. The service account key is read just once.
+    """
+
+    def __init__(self, refresh_margin=300):
+        self.refresh_margin = refresh_margin
+        self._lock = threading.Lock()
+        self._credentials = None
+        self._access_token = None
+        self._expires_at = 0
+
+    def get(self):
+        if time.time() < self._expires_at - self.refresh_margin:
+            return self._access_token
+
+        with self._lock:
+            # Maybe refreshed by another thread, meanwhile
+            if time.time() < self._expires_at - self.refresh_margin:
+                return self._access_token
+
+            if self._credentials is None:
+                self._credentials = ServiceAccountCredentials.from_json_keyfile_name(
+                    # 'stacrypt-1c4dc-firebase-adminsdk-hy7hb-ad49502f48.json', SCOPES)
+                    settings.firebase.service_account_key, SCOPES)
+
+            access_token_info = self._credentials.get_access_token()
+            self._access_token = access_token_info.access_token
+            # The google access tokens are valid for an hour
+            expires_in = access_token_info.expires_in or 3600
+            self._expires_at = time.time() + expires_in
+            logger.info(f'FCM access token is refreshed, expires in {expires_in} seconds')
+            return self._access_token
+
+    def invalidate(self):
+        self._expires_at = 0
+
+
+_access_token_cache = AccessTokenCache()
+
+
 def _get_access_token():
     """Retrieve a valid access token that can be used to authorize requests.
     :return: Access token.
     """
-    credentials = ServiceAccountCredentials.from_json_keyfile_name(
-        # 'stacrypt-1c4dc-firebase-adminsdk-hy7hb-ad49502f48.json', SCOPES)
-        settings.firebase.service_account_key, SCOPES)
-    access_token_info = credentials.get_access_token()
-    return access_token_info.access_token
+    return _access_token_cache.get()
+
+
+_fcm_session = None
+
+
+def _get_fcm_session():
+    global _fcm_session
+    if _fcm_session is None:
+        _fcm_session = create_pooled_session(pool_size=10)
+    return _fcm_session
 
 
 def _send_fcm_message(fcm_message):
@@ -61,18 +172,24 @@ def _send_fcm_message(fcm_message):
     Args:
       fcm_message: JSON object that will make up the body of the request.
     """
-    headers = {
-        'Authorization': 'Bearer ' + _get_access_token(),
-        'Content-Type': 'application/json; UTF-8',
-    }
-    resp = requests.post(FCM_URL, data=json.dumps(fcm_message), headers=headers)
+    for __ in range(2):
+        headers = {
+            'Authorization': 'Bearer ' + _get_access_token(),
+            'Content-Type': 'application/json; UTF-8',
+        }
+        resp = _get_fcm_session().post(FCM_URL, data=json.dumps(fcm_message), headers=headers)
+        if resp.status_code != 401:
+            break
+
+        # The token is revoked before its expiry, so retrying once with a new one
+        _access_token_cache.invalidate()
 
     if resp.status_code == 200:
-        print('Message sent to Firebase for delivery, response:')
-        print(resp.text)
+        logger.info(f'Message sent to Firebase for delivery, response: {resp.text}')
     else:
-        print('Unable to send message to Firebase')
-        print(resp.text)
+        logger.error(f'Unable to send message to Firebase: {resp.text}')
+
+    return resp
 
 
 def _build_common_message():
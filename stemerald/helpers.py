@@ -1,3 +1,12 @@
+import requests
+import ujson
+from nanohttp import context
+from nanohttp.contexts import ContextIsNotInitializedError
+from requests.adapters import HTTPAdapter
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
 class ObjectAlreadyInitializedError(Exception):
     pass
 
@@ -77,3 +86,86 @@ class DeferredObject(ObjectProxy):
             raise ObjectAlreadyInitializedError("Object is already initialized.")
 
         self._set_instance(self._backend_factory(**kw))
+
+
+def create_pooled_session(pool_size, pool_block=False, max_retries=0, headers=None):
+    """
+    Creates a keep-alive `requests.Session` which reuses up to `pool_size` connections per host.
+
+    :param pool_size: Maximum number of connections to keep alive for each host
+    :param pool_block: Whether to wait for a free connection (instead of opening a throw-away one) when the pool
+                       is saturated
+    :param max_retries: An integer or a `urllib3.util.Retry` instance
+    :param headers: Default headers of the session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_maxsize=pool_size, pool_block=pool_block, max_retries=max_retries)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update(headers or {})
+    return session
+
+
+def call_after_commit(session, callback):
+    """
+    Schedules the `callback` to be called (once) right after the current transaction of the `session` is committed.
+    It will be discarded if the transaction is rolled back.
+
+    Note: The session is not usable inside the callback, so do not touch the database there.
+    """
+    session.info.setdefault('after_commit_callbacks', []).append(callback)
+
+
+@event.listens_for(Session, 'after_commit')
+def _call_after_commit_callbacks(session):
+    for callback in session.info.pop('after_commit_callbacks', []):
+        callback()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_commit_callbacks(session):
+    session.info.pop('after_commit_callbacks', None)
+
+
+def stream_json_list(rows, chunk_size=100):
+    """
+    Encodes the `rows` to a json list lazily, `chunk_size` rows per chunk, to be returned from an action decorated
+    by `action(content_type='application/json')` (instead of `json`). So neither the whole list of dicts nor the
+    whole document is kept in the memory, and the response is transferred chunked.
+
+    Note: Do anything which may fail (e.g. calling the RPC) before returning the generator, because the status and
+    headers are already sent when the rows are being produced. The rows also should not rely on the `context`.
+    """
+    separator = '['
+    chunk = []
+    for row in rows:
+        chunk.append(separator)
+        chunk.append(ujson.dumps(row))
+        separator = ','
+        if len(chunk) >= chunk_size * 2:
+            yield ''.join(chunk)
+            chunk = []
+
+    chunk.append('[]' if separator == '[' else ']')
+    yield ''.join(chunk)
+
+
+def request_memo(key, factory):
+    """
+    Calls the `factory` once per request (and returns the same result for the rest of it), e.g.:
+
+        def get_receipts():
+            return request_memo('receipts', lambda: ...)
+
+    Outside of a request, it is called every time.
+    """
+    try:
+        memo = getattr(context, 'stemerald_memo', None)
+        if memo is None:
+            memo = context.stemerald_memo = {}
+    except ContextIsNotInitializedError:
+        return factory()
+
+    if key not in memo:
+        memo[key] = factory()
+    return memo[key]
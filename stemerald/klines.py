@@ -0,0 +1,214 @@
+import time
+from decimal import Decimal
+
+import redis
+import ujson
+from restfulpy.logging_ import get_logger
+
+from stemerald.cache import redis_client, market_data_cache
+from stemerald.helpers import DeferredObject
+from stemerald.stexchange import stexchange_client
+
+logger = get_logger('KLINE')
+
+# interval: the smaller interval which it could be derived from (all in seconds)
+DERIVATIONS = {
+    3600: 60,
+    86400: 3600,
+    604800: 86400,
+}
+
+
+def aggregate_klines(candles, interval):
+    """
+    Aggregates the (sorted) `candles` into the candles of the larger `interval`, aligned to the epoch.
+
+    Each candle is: [time, open, close, high, low, volume, amount, market]
+    """
+    result = []
+    for candle in candles:
+        bucket = candle[0] // interval * interval
+        if result and result[-1][0] == bucket:
+            aggregated = result[-1]
+            aggregated[2] = candle[2]
+            aggregated[3] = max(aggregated[3], candle[3], key=Decimal)
+            aggregated[4] = min(aggregated[4], candle[4], key=Decimal)
+            aggregated[5] = str(Decimal(aggregated[5]) + Decimal(candle[5]))
+            aggregated[6] = str(Decimal(aggregated[6]) + Decimal(candle[6]))
+        else:
+            result.append([bucket, *candle[1:]])
+
+    return result
+
+
+class KlineAlignmentException(Exception):
+    pass
+
+
+class KlineRangeException(Exception):
+    pass
+
+
+class KlineStore:
+    """
+    Keeps the closed candles of each market and interval in redis, because they will never change. Just the open
+    candle (the tail) is fetched from the engine each time, through the short-living `market_data_cache`.
+
+    A contiguous range of the candles, which is already fetched (the coverage), is kept per market and interval, so
+    a request is served from the store if it is covered, otherwise just the missing parts are fetched and the
+    coverage is extended.
+
+    The larger intervals (see `DERIVATIONS`) are aggregated from the stored smaller ones when they are covered,
+    instead of calling the engine.
+
+    The candles are looked up by their epoch-aligned times (i.e. the weeks start on Thursdays), so the alignment of
+    each market and interval is checked against the candles which the engine returns. The intervals which the
+    engine does not align to the epoch are not stored, they are served by the engine directly; and an interval is
+    derived just when the engine is known to align it too. All of the keys expire after `ttl` seconds.
+
+    A candle is taken as closed `grace` seconds after its end, because a late deal (or the clock of the engine being
+    behind ours) could still change it; until then it is fetched (like the open one) each time. At most
+    `max_candles` are served per request, `KlineRangeException` is raised for the larger ranges.
+
+    Usage:
+
+        kline = kline_store.get(market.name, start, end, interval)
+
+    """
+    prefix = 'kline-store'
+    read_chunk_size = 1000
+
+    def __init__(self, enabled=True, ttl=30 * 86400, grace=5, max_candles=5000):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.grace = grace
+        self.max_candles = max_candles
+
+    def _key(self, market, interval):
+        return f'{self.prefix}:{market}:{interval}'
+
+    def get(self, market, start, end, interval):
+        if interval > 0 and (end - start) // interval >= self.max_candles:
+            raise KlineRangeException()
+
+        if not self.enabled or interval <= 0:
+            return market_data_cache.call('market_kline', market, start, end, interval)
+
+        try:
+            aligned = self._get_alignment(market, interval)
+            if aligned is False:
+                return market_data_cache.call('market_kline', market, start, end, interval)
+            return self._get(market, start, end, interval, aligned)
+        except KlineAlignmentException:
+            logger.warning(f'The {interval}s candles of {market} are not aligned to the epoch, not storing them')
+            return market_data_cache.call('market_kline', market, start, end, interval)
+        except redis.RedisError:
+            logger.exception('Kline store is not available, calling the engine directly')
+            return market_data_cache.call('market_kline', market, start, end, interval)
+
+    def _get(self, market, start, end, interval, aligned=None):
+        first = start // interval * interval
+        last = end // interval * interval
+        now = int(time.time())
+        open_start = now // interval * interval
+        tail_start = (now - self.grace) // interval * interval
+
+        result = []
+        closed_last = min(last, tail_start - interval)
+        if first <= closed_last:
+            result.extend(self._get_closed(market, first, closed_last, interval))
+
+        if first <= open_start and tail_start <= last:
+            # The open candle, and the last closed one during the grace period. Keeping the arguments independent
+            # of the request, to let it be shared between the requests.
+            candles = market_data_cache.call('market_kline', market, tail_start, open_start + interval - 1, interval)
+            if aligned is None:
+                self._check_alignment(market, interval, candles)
+            result.extend(candle for candle in candles if max(first, tail_start) <= candle[0] <= last)
+
+        return result
+
+    def _get_alignment(self, market, interval):
+        """
+        Whether the engine aligns the candles to the epoch, `None` if it is not known yet.
+        """
+        aligned = redis_client.get(f'{self._key(market, interval)}:aligned')
+        return None if aligned is None else aligned == b'1'
+
+    def _check_alignment(self, market, interval, candles):
+        if not candles:
+            return
+
+        aligned = all(candle[0] % interval == 0 for candle in candles)
+        redis_client.set(f'{self._key(market, interval)}:aligned', int(aligned), ex=self.ttl)
+        if not aligned:
+            raise KlineAlignmentException()
+
+    def _get_coverage(self, market, interval):
+        coverage = redis_client.get(f'{self._key(market, interval)}:coverage')
+        if coverage is None:
+            return None
+        return tuple(int(i) for i in coverage.split(b':'))
+
+    def _covers(self, market, interval, first, last):
+        coverage = self._get_coverage(market, interval)
+        return coverage is not None and coverage[0] <= first and last <= coverage[1]
+
+    def _get_closed(self, market, first, last, interval):
+        key = self._key(market, interval)
+        coverage = self._get_coverage(market, interval)
+
+        if coverage is None or not (coverage[0] <= first and last <= coverage[1]):
+            if coverage is not None and first <= coverage[1] + interval and coverage[0] - interval <= last:
+                # Overlapped or adjacent, so just the missing parts are needed
+                missing = []
+                if first < coverage[0]:
+                    missing.append((first, coverage[0] - interval))
+                if coverage[1] < last:
+                    missing.append((coverage[1] + interval, last))
+                coverage = (min(first, coverage[0]), max(last, coverage[1]))
+
+            else:
+                missing = [(first, last)]
+                coverage = (first, last)
+
+            loaded = [self._load(market, f, l, interval) for f, l in missing]
+            candles = [c for part in loaded for c in part]
+
+            # Writing the candles and the coverage in one transaction, to never claim a candle which is not stored.
+            # An empty part might be just not available yet (e.g. the engine is behind), so it is not claimed.
+            pipeline = redis_client.pipeline()
+            if candles:
+                pipeline.hmset(key, {candle[0]: ujson.dumps(candle) for candle in candles})
+                pipeline.expire(key, self.ttl)
+            if all(loaded):
+                pipeline.set(f'{key}:coverage', f'{coverage[0]}:{coverage[1]}', ex=self.ttl)
+            pipeline.execute()
+
+        result = []
+        chunk = self.read_chunk_size * interval
+        for chunk_first in range(first, last + 1, chunk):
+            result.extend(
+                ujson.loads(candle)
+                for candle in redis_client.hmget(
+                    key, list(range(chunk_first, min(last, chunk_first + chunk - interval) + 1, interval))
+                )
+                if candle is not None
+            )
+
+        return result
+
+    def _load(self, market, first, last, interval):
+        smaller = DERIVATIONS.get(interval)
+        smaller_last = last + interval - smaller if smaller is not None else None
+        # Not deriving from too many of the smaller ones (e.g. months of minutes), the engine is cheaper then
+        if smaller is not None and (smaller_last - first) // smaller < self.max_candles \
+                and self._get_alignment(market, interval) and self._covers(market, smaller, first, smaller_last):
+            return aggregate_klines(self._get_closed(market, first, smaller_last, smaller), interval)
+
+        candles = stexchange_client.market_kline(market, first, last + interval - 1, interval)
+        self._check_alignment(market, interval, candles)
+        return [candle for candle in candles if first <= candle[0] <= last]
+
+
+kline_store: KlineStore = DeferredObject(KlineStore)
@@ -5,31 +5,23 @@ import threading
 from restfulpy import Launcher
 
 
-class WalletSyncLauncher(Launcher):  # pragma: no cover
-
-    @classmethod
-    def create_parser(cls, subparsers):
-        parser = subparsers.add_parser('syncwallet', help='Start wallet sync looper')
-        return parser
-
-    def launch(self):
-        from stemerald.loopers import stawallet_sync_looper
+class LooperLauncher(Launcher):  # pragma: no cover
+    """
+    Runs a looper in a daemon thread until the process is killed.
+    """
 
+    def start_looper(self, target, name, **kwargs):
         signal.signal(signal.SIGINT, self.kill_signal_handler)
         signal.signal(signal.SIGTERM, self.kill_signal_handler)
 
         t = threading.Thread(
-            target=stawallet_sync_looper,
-            name='stawallet-sync-looper',
+            target=target,
+            name=name,
             daemon=True,
-            kwargs=dict()
+            kwargs=kwargs
         )
         t.start()
 
-        print(f'Stawallet sync looper started!')
-        print('Press Ctrl+C to terminate looper')
-        signal.pause()
-
     # noinspection PyUnusedLocal
     @staticmethod
     def kill_signal_handler(signal_number, frame):
@@ -43,3 +35,79 @@ class WalletSyncLauncher(Launcher):  # pragma: no cover
         sys.stderr.close()
         sys.stdout.close()
         sys.exit(1)
+
+
+class WalletSyncLauncher(LooperLauncher):  # pragma: no cover
+
+    @classmethod
+    def create_parser(cls, subparsers):
+        parser = subparsers.add_parser('syncwallet', help='Start wallet sync looper')
+        parser.add_argument(
+            '-c', '--concurrency',
+            type=int,
+            default=None,
+            help='How many cryptocurrencies to sync at the same time, default: stawallet.sync_concurrency setting'
+        )
+        return parser
+
+    def launch(self):
+        from stemerald.loopers import stawallet_sync_looper
+
+        self.start_looper(stawallet_sync_looper, 'stawallet-sync-looper', concurrency=self.args.concurrency)
+
+        print(f'Stawallet sync looper started!')
+        print('Press Ctrl+C to terminate looper')
+        signal.pause()
+
+
+class SmsDrainLauncher(LooperLauncher):  # pragma: no cover
+
+    @classmethod
+    def create_parser(cls, subparsers):
+        parser = subparsers.add_parser('drainsms', help='Start sms drain looper')
+        parser.add_argument(
+            '-b', '--batch-size',
+            type=int,
+            default=None,
+            help='How many sms to send at once, default: sms.drain_batch_size setting'
+        )
+        return parser
+
+    def launch(self):
+        from stemerald.loopers import sms_drain_looper
+
+        self.start_looper(sms_drain_looper, 'sms-drain-looper', batch_size=self.args.batch_size)
+
+        print(f'Sms drain looper started!')
+        print('Press Ctrl+C to terminate looper')
+        signal.pause()
+
+
+class PushGatewayLauncher(Launcher):  # pragma: no cover
+
+    @classmethod
+    def create_parser(cls, subparsers):
+        parser = subparsers.add_parser('pushgateway', help='Start the market data push gateway')
+        parser.add_argument(
+            '-H', '--host',
+            default=None,
+            help='Address to bind, default: push_gateway.host setting'
+        )
+        parser.add_argument(
+            '-p', '--port',
+            type=int,
+            default=None,
+            help='Port to bind, default: push_gateway.port setting'
+        )
+        return parser
+
+    def launch(self):
+        from aiohttp import web
+        from nanohttp import settings
+        from stemerald.pushgateway import create_push_gateway
+
+        web.run_app(
+            create_push_gateway().create_application(),
+            host=self.args.host or settings.push_gateway.host,
+            port=self.args.port or settings.push_gateway.port,
+        )
@@ -1,116 +1,178 @@
 import time
-from decimal import getcontext, Decimal
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 
 from nanohttp import settings
 from restfulpy.logging_ import get_logger
 from restfulpy.orm import session_factory
+from restfulpy.taskqueue import Task
 
-from stemerald import stawallet_client, stexchange_client
-from stemerald.controllers.wallet import deposit_to_dict
-from stemerald.models import Cryptocurrency, Notification
-from stemerald.stexchange import RepeatUpdateException
+from stemerald import stawallet_client
+from stemerald.deposits import credit_deposits
+from stemerald.models import Cryptocurrency, Sms
+from stemerald.sms import create_sms_provider
 
 logger = get_logger('looper')
 
 
-def stawallet_sync_looper():
-    isolated_session = session_factory(expire_on_commit=False)
+def sync_cryptocurrency_deposits(symbol):
+    """
+    Syncs the new deposits of a cryptocurrency, using its own session, so it can be run alongside the others.
+    """
+    session = session_factory(expire_on_commit=False)
+    try:
+        cryptocurrency = session.query(Cryptocurrency).filter(Cryptocurrency.symbol == symbol).one()
+
+        batch_size = settings.stawallet.sync_commit_batch_size
+        pending_deposits = []
+        page = 0
+
+        while True:
+            new_sync_time = int(time.time())
+            new_deposits = stawallet_client.get_deposits(
+                wallet_id=cryptocurrency.wallet_id,
+                user_id="*",
+                asc=True,
+                after=cryptocurrency.wallet_latest_sync,
+                page=page
+            )
+            if len(new_deposits) == 0:
+                break
+
+            pending_deposits.extend(new_deposits)
+            if len(pending_deposits) >= batch_size:
+                credit_deposits(session, cryptocurrency, pending_deposits)
+                session.commit()
+                pending_deposits = []
+
+            # Next page:
+            page += 1
+
+        credit_deposits(session, cryptocurrency, pending_deposits)
+        # The checkpoint moves just at the end; the already credited batches are harmlessly repeated on a failure
+        cryptocurrency.wallet_latest_sync = new_sync_time
+        session.commit()
+
+        logger.info(f'Wallet {cryptocurrency.wallet_id} synced successfully.')
+    except:
+        logger.exception(f'Error syncing {symbol} wallet.')
+        try:
+            session.rollback()
+        except:
+            logger.exception(f'Error rolling back the iteration\'s session.')
+
+    finally:
+        session.close()
+
+
+def stawallet_sync_looper(concurrency=None):
+    """
+    Each cryptocurrency is synced independently in a bounded pool of workers, so a slow wallet just delays itself.
+
+    When the stawallet webhook is enabled (`stawallet.webhook_secret`), the deposits are pushed to us, so this is
+    just a slow reconciliation (every `stawallet.reconciliation_gap` seconds) for the missed events.
+    """
+    concurrency = concurrency or settings.stawallet.sync_concurrency
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='stawallet-sync')
+    in_progress = {}
     context = {'counter': 0}
 
     while True:
 
         logger.info("Trying to sync wallet, Counter: %s" % context['counter'])
-        cryptocurrencies = isolated_session.query(Cryptocurrency).all()
-        for cryptocurrency in cryptocurrencies:
-            # Get latest synced deposit update time
+        try:
+            session = session_factory()
             try:
+                symbols = [symbol for symbol, in session.query(Cryptocurrency.symbol)]
+            finally:
+                session.close()
 
-                page = 0
-
-                while True:
-                    new_sync_time = int(time.time())
-                    new_deposits = stawallet_client.get_deposits(
-                        wallet_id=cryptocurrency.wallet_id,
-                        user_id="*",
-                        asc=True,
-                        after=cryptocurrency.wallet_latest_sync,
-                        page=page
-                    )
-                    if len(new_deposits) == 0:
-                        break
-
-                    for deposit in new_deposits:
-                        # Try to update the stexchange
-                        change_amount_normalized = cryptocurrency.smallest_unit_to_normalized(deposit['netAmount'])
-                        change_amount_output = cryptocurrency.smallest_unit_to_output(deposit['netAmount'])
-                        deposit = deposit_to_dict(cryptocurrency, deposit)
-
-                        # TODO: Check the range
-                        # TODO: Calculate the commission
-                        # TODO: Check the purpose (e.g. be 'deposit', not 'charge')
-
-                        if deposit['user'] is None:
-                            # FIXME: Unknown (or 'charge')
-                            # TODO: Inform and handle
-                            pass
-                        else:
-
-                            try:
-
-                                getcontext().prec = 8
-                                if deposit['isConfirmed'] is True and deposit['error'] is None:
-                                    # TODO: Check whether the user is admin (charge) or user (deposit)?
-                                    wallet_update_respones = stexchange_client.balance_update(
-                                        user_id=int(deposit['user']),
-                                        asset=cryptocurrency.wallet_id,
-                                        business='deposit',  # TODO: Are you sure?
-                                        business_id=int(deposit['id']),  # TODO: Are you sure?
-                                        change=change_amount_normalized,
-                                        # TODO: Make sure is greater than 0
-                                        detail={}  # TODO
-                                    )
-
-                                # TODO: Notify the user
-                                notification = Notification()
-                                notification.member_id = int(deposit['user'])
-
-                                if deposit['isConfirmed'] is True:
-                                    notification.title = 'Your balance has been increased'
-                                    notification.description = f'Your new deposit has just completely confirmed. ' \
-                                        f'You balance has been increased ' \
-                                        f'{change_amount_output} {cryptocurrency.wallet_id} '
-
-                                elif deposit['status'].lower() == 'orphan':
-                                    notification.title = 'New deposit discovered'
-                                    notification.description = f'Your new deposit has just been found. ' \
-                                        f'Please be patient for your transaction to be mined and get ' \
-                                        f'{deposit["confirmationsLeft"]} more confirmations '
-
-                                else:
-                                    notification.title = 'New deposit in the way'
-                                    notification.description = f'Your new deposit has just got it\'s first ' \
-                                        f'confirmation. You will have full access to it as soon as it receives ' \
-                                        f'{deposit["confirmationsLeft"]} more confirmations '
-
-                                isolated_session.add(notification)
-
-                            except RepeatUpdateException as e:
-                                # TODO: Log
-                                pass
-
-                    # Next page:
-                    page += 1
-
-                cryptocurrency.wallet_latest_sync = new_sync_time
-                isolated_session.commit()
-
-                logger.exception(f'Wallet {cryptocurrency.wallet_id} synced successfully.')
-            except:
-                logger.exception(f'Error syncing {cryptocurrency.wallet_id} wallet.')
-                try:
-                    isolated_session.rollback()
-                except:
-                    logger.exception(f'Error rolling back the iteration\'s session.')
+        except:
+            logger.exception('Error listing the cryptocurrencies.')
+            symbols = []
+
+        for symbol in symbols:
+            if symbol in in_progress and not in_progress[symbol].done():
+                # Still syncing since the previous round
+                continue
+            in_progress[symbol] = executor.submit(sync_cryptocurrency_deposits, symbol)
 
         context['counter'] += 1
-        time.sleep(settings.stawallet.sync_gap)
+        time.sleep(
+            settings.stawallet.reconciliation_gap if settings.stawallet.webhook_secret else settings.stawallet.sync_gap
+        )
+
+
+def pop_sms_batch(session, batch_size):
+    """
+    Pops up to `batch_size` new sms tasks at once. The rows which are locked by the other drainers (or the task
+    queue worker) are skipped instead of waited for.
+    """
+    find_query = session.query(Task.id) \
+        .join(Sms, Sms.id == Task.id) \
+        .filter(Task.status == 'new') \
+        .order_by(Task.priority.desc()) \
+        .order_by(Task.created_at) \
+        .limit(batch_size) \
+        .with_for_update(of=Task, skip_locked=True)
+
+    task_ids = [task_id for task_id, in find_query]
+    if not task_ids:
+        session.commit()
+        return []
+
+    session.query(Task) \
+        .filter(Task.id.in_(task_ids)) \
+        .update({'status': 'in-progress', 'started_at': datetime.now()}, synchronize_session=False)
+    session.commit()
+
+    return session.query(Sms).filter(Sms.id.in_(task_ids)).all()
+
+
+def drain_sms_batch(session, batch_size):
+    """
+    Sends a batch of the queued sms tasks using `SmsProvider.send_many`.
+
+    :return: The number of the popped tasks
+    """
+    tasks = pop_sms_batch(session, batch_size)
+    if not tasks:
+        return 0
+
+    errors = create_sms_provider().send_many([task.to_message() for task in tasks])
+
+    now = datetime.now()
+    for task, error in zip(tasks, errors):
+        task.terminated_at = now
+        if error is None:
+            task.status = 'success'
+        else:
+            task.status = 'failed'
+            task.fail_reason = ''.join(traceback.format_exception(type(error), error, error.__traceback__))[-2048:]
+
+    session.commit()
+    logger.info(f'{errors.count(None)} of {len(tasks)} sms sent.')
+    return len(tasks)
+
+
+def sms_drain_looper(batch_size=None):
+    """
+    Drains the sms queue in batches of `sms.drain_batch_size`, instead of one task per turn of the task queue worker.
+    """
+    batch_size = batch_size or settings.sms.drain_batch_size
+    session = session_factory(expire_on_commit=False)
+
+    while True:
+        try:
+            drained = drain_sms_batch(session, batch_size)
+        except:
+            logger.exception('Error draining the sms queue.')
+            drained = 0
+            try:
+                session.rollback()
+            except:
+                logger.exception('Error rolling back the sms drain session.')
+
+        if drained < batch_size:
+            time.sleep(settings.sms.drain_gap)
@@ -6,4 +6,4 @@ from .membership import Member, Admin, Client, ClientEvidence, Invitation
 from .messaging import Sms, ResetPasswordEmail, VerificationEmail, VerificationSms
 from .security import SecurityLog, IpWhitelist
 from .support import Ticket, TicketMessage, TicketDepartment, TicketAttachment
-from .noticiations import Notification
+from .noticiations import Notification, BroadcastNotification, NotificationReceipt
@@ -6,6 +6,38 @@ from sqlalchemy import Integer, ForeignKey
 from sqlalchemy.sql.sqltypes import Unicode, Enum, DECIMAL
 
 
+class CurrencyFormatter:
+    """
+    The precompiled `normalized -> output` conversion of a currency, see `Currency.formatter`.
+
+    The output is exactly the same as the one of the (former) per-value `Currency.normalized_to_output`.
+
+    """
+
+    def __init__(self, smallest_unit_scale, normalization_scale):
+        self.key = (smallest_unit_scale, normalization_scale)
+        self._exponent = -normalization_scale
+        self._spec = f'.{max(0, -smallest_unit_scale)}f'
+
+    def format(self, number):
+        if number is None:
+            return None
+        if not isinstance(number, Decimal):
+            number = Decimal(number)
+
+        return format(number.scaleb(self._exponent), self._spec)
+
+    def format_many(self, numbers):
+        """
+        Converts a whole column at once.
+        """
+        exponent, spec = self._exponent, self._spec
+        return [
+            None if n is None else format((n if isinstance(n, Decimal) else Decimal(n)).scaleb(exponent), spec)
+            for n in numbers
+        ]
+
+
 class Currency(OrderingMixin, FilteringMixin, DeclarativeBase):
     """
     For exp. for 'BTC' we'll use:
@@ -44,17 +76,24 @@ class Currency(OrderingMixin, FilteringMixin, DeclarativeBase):
             return None
         return Decimal(number).scaleb(self.smallest_unit_scale + self.normalization_scale)
 
+    @property
+    def formatter(self) -> CurrencyFormatter:
+        """
+        Cached on the instance and rebuilt whenever the scales are changed.
+        """
+        key = (self.smallest_unit_scale, self.normalization_scale)
+        formatter = self.__dict__.get('_formatter')
+        if formatter is None or formatter.key != key:
+            formatter = self._formatter = CurrencyFormatter(*key)
+        return formatter
+
     def normalized_to_output(self, number: Decimal):
         """
         :return:
         """
         if number is None:
             return None
-        if not isinstance(number, Decimal):
-            number = Decimal(number)
-
-        return ('{:.' + str(max(0, -self.smallest_unit_scale)) + 'f}') \
-            .format(number.scaleb(- self.normalization_scale))
+        return self.formatter.format(number)
 
     def normalized_smallest_unit(self, number: Decimal):
         """
@@ -14,6 +14,8 @@ from sqlalchemy.orm import synonym
 from sqlalchemy.sql.sqltypes import Integer, Unicode, Enum, DateTime, JSON
 from sqlalchemy_media import Image, WandAnalyzer, ImageValidator, ImageProcessor
 
+from stemerald.helpers import request_memo
+
 
 class Member(ModifiedMixin, ActivationMixin, OrderingMixin, FilteringMixin, DeclarativeBase):
     __tablename__ = 'member'
@@ -68,25 +70,41 @@ class Member(ModifiedMixin, ActivationMixin, OrderingMixin, FilteringMixin, Decl
         hashed_pass.update((password + self.password[:64]).encode('utf-8'))
         return self.password[64:] == hashed_pass.hexdigest()
 
+    @property
+    def claims(self):
+        return dict(
+            id=self.id,
+            roles=self.roles,
+            email=self.email,
+        )
+
     def create_jwt_principal(self, session_id=None):
+        return self.create_jwt_principal_of(self.claims, session_id=session_id)
+
+    @staticmethod
+    def create_jwt_principal_of(claims, session_id=None):
         # FIXME: IMPORTANT Include user password as salt in signature
 
         if session_id is None:
             session_id = str(uuid.uuid4())
 
-        return JwtPrincipal(dict(
-            id=self.id,
-            roles=self.roles,
-            email=self.email,
-            sessionId=session_id
-        ))
+        return JwtPrincipal(dict(claims, sessionId=session_id))
 
     @classmethod
     def current(cls):
+        """
+        The member of the current request, resolved by the id of the identity (from the identity map, if already
+        loaded) just once per request.
+        """
         if context.identity is None:
             raise HttpUnauthorized()
 
-        return cls.query.filter(cls.email == context.identity.email).one()
+        member_id = context.identity.id
+        member = request_memo(f'current-member:{cls.__name__}:{member_id}', lambda: cls.query.get(member_id))
+        if member is None:
+            raise HttpUnauthorized()
+
+        return member
 
     def change_password(self, current_password, new_password):
         if not self.validate_password(current_password):
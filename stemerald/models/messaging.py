@@ -5,7 +5,7 @@ from restfulpy.orm import Field
 from restfulpy.taskqueue import Task
 from sqlalchemy import Integer, ForeignKey, Unicode, JSON
 
-from stemerald.sms import create_sms_provider
+from stemerald.sms import create_sms_provider, SmsMessage
 
 logger = get_logger('MESSAGING')
 
@@ -31,6 +31,9 @@ class Sms(Task):
     def sms_text(self):
         return self.message_format % self.body
 
+    def to_message(self):
+        return SmsMessage(self.to, text=self.sms_text)
+
     def do_(self, context):  # pragma: no cove
         create_sms_provider().send(self.to, self.sms_text)
         logger.info('%s has been sent to %s', self.sms_text, self.to)
@@ -45,6 +48,9 @@ class VerificationSms(Sms):
         'polymorphic_identity': 'ownership_verification_sms'
     }
 
+    def to_message(self):
+        return SmsMessage(self.to, code=self.body['code'], template=self.body['template'])
+
     def do_(self, context):  # pragma: no cove
         code = self.body['code']
         template = self.body['template']
@@ -1,15 +1,16 @@
 from datetime import datetime
 
-from firebase_admin import messaging
+from nanohttp import context, settings
 from restfulpy.logging_ import get_logger
 from restfulpy.orm import OrderingMixin, FilteringMixin, Field, SoftDeleteMixin, \
-    PaginationMixin
+    PaginationMixin, DeclarativeBase, DBSession
 from restfulpy.taskqueue import Task
+from restfulpy.utils import format_iso_datetime
 from sqlalchemy import DateTime, Integer, ForeignKey, Unicode, JSON
 from sqlalchemy.ext.hybrid import hybrid_property
 
-from stemerald.firebase import FirebaseClient
-from stemerald.models import Member
+from stemerald.firebase import FirebaseClient, send_multicast, send_to_topic
+from stemerald.helpers import request_memo
 
 logger = get_logger('NOTIFICATION')
 
@@ -22,41 +23,26 @@ class Notification(SoftDeleteMixin, PaginationMixin, OrderingMixin, FilteringMix
     def do_(self, context):  # pragma: no cove
         from stemerald import stemerald
 
-        app = FirebaseClient().instance
+        # Initializes the firebase app, if not already
+        FirebaseClient().instance
 
         # TODO: Retrieve notifications policy of the user
-        # See documentation on defining a message payload.
 
-        # TODO: Retrieve all registered tokens about all user's connected devices
-
-        member = Member.query.filter(Member.id == self.member_id).one()
-        sessions = stemerald.__authenticator__.get_member_sessions_info(member.id)
-        firebase_tokens = [(s['firebaseToken'] if 'firebaseToken' in s else '') for s in sessions]
-        firebase_tokens = list(set(filter(lambda x: (x is not None) and (len(x) > 0), firebase_tokens)))
+        authenticator = stemerald.__authenticator__
+        sessions = authenticator.get_member_sessions_info(self.member_id)
+        firebase_tokens = {s.get('firebaseToken') for s in sessions if s is not None}
+        firebase_tokens.discard(None)
+        firebase_tokens.discard('')
 
         logger.info(f'Founded sessions for this member: {len(sessions)}')
-        messages = [
-            messaging.Message(
-                notification=messaging.Notification(
-                    title=self.title,
-                    body=self.description,
-                ),
-                token=t,
-            ) for t in firebase_tokens
-        ]
-        logger.info(f'Founded devices (which contains valid firebase token) for this member: {len(messages)}')
-
-        # Send a message to the device corresponding to the provided
-        # registration token.
+        logger.info(f'Founded devices (which contains valid firebase token) for this member: {len(firebase_tokens)}')
+
         logger.info(f'Sending notification to {self.member_id}\'s devices')
-        for m in messages:
-            try:
-                response = messaging.send(m)
-                logger.info(f'Successfully sent to device: {m.token}')
-                # Response is a message ID string.
-                logger.info(f'Successfully sent message: {response} to member_id: {self.member_id}')
-            except:
-                logger.info(f'Error while sending to device: {m.token}')
+        stale_tokens = send_multicast(firebase_tokens, title=self.title, body=self.description)
+
+        if stale_tokens:
+            logger.info(f'Removing {len(stale_tokens)} stale firebase tokens of member: {self.member_id}')
+            authenticator.remove_firebase_tokens(self.member_id, stale_tokens, sessions=sessions)
 
     __tablename__ = 'notification'
     __mapper_args__ = {
@@ -134,3 +120,78 @@ class Notification(SoftDeleteMixin, PaginationMixin, OrderingMixin, FilteringMix
     def is_email_verified(self):
         # noinspection PyUnresolvedReferences
         return self.read_at.isnot(None)
+
+
+class BroadcastNotification(Notification):
+    """
+    A notification to all of the members, using a single task row (with no `member_id`).
+
+    It is sent once to the `firebase.broadcast_topic` FCM topic, or (if there is no topic) to all of the known
+    devices using multicast. The read state is kept per member in `NotificationReceipt`, lazily: a row is added
+    just when a member reads it.
+    """
+
+    __mapper_args__ = {
+        'polymorphic_identity': 'broadcast_notification'
+    }
+
+    def do_(self, context_):  # pragma: no cover
+        from stemerald import stemerald
+
+        # Initializes the firebase app, if not already
+        FirebaseClient().instance
+
+        if settings.firebase.broadcast_topic:
+            logger.info(f'Broadcasting notification {self.id} to topic: {settings.firebase.broadcast_topic}')
+            send_to_topic(settings.firebase.broadcast_topic, title=self.title, body=self.description)
+            return
+
+        authenticator = stemerald.__authenticator__
+        sessions = authenticator.get_all_sessions_info()
+        firebase_tokens = {s.get('firebaseToken') for s in sessions}
+        firebase_tokens.discard(None)
+        firebase_tokens.discard('')
+
+        logger.info(f'Broadcasting notification {self.id} to {len(firebase_tokens)} devices')
+        stale_tokens = send_multicast(firebase_tokens, title=self.title, body=self.description)
+
+        if stale_tokens:
+            logger.info(f'Removing {len(stale_tokens)} stale firebase tokens')
+            authenticator.remove_firebase_tokens(None, stale_tokens, sessions=sessions)
+
+    @staticmethod
+    def get_read_receipts(member_id):
+        """
+        :return: {notification_id: read_at} of the member, queried once per request
+        """
+        return request_memo(
+            f'notification-receipts:{member_id}',
+            lambda: dict(
+                DBSession.query(NotificationReceipt.notification_id, NotificationReceipt.read_at)
+                    .filter(NotificationReceipt.member_id == member_id)
+            )
+        )
+
+    def mark_as_read(self, member_id):
+        if self.id not in self.get_read_receipts(member_id):
+            receipt = NotificationReceipt(notification_id=self.id, member_id=member_id, read_at=datetime.now())
+            DBSession.add(receipt)
+            self.get_read_receipts(member_id)[self.id] = receipt.read_at
+
+    def to_dict(self):
+        result = super().to_dict()
+
+        identity = context.identity
+        if identity is not None and identity.is_in_roles('client'):
+            read_at = self.get_read_receipts(identity.id).get(self.id)
+            result['readAt'] = format_iso_datetime(read_at) if read_at is not None else None
+
+        return result
+
+
+class NotificationReceipt(DeclarativeBase):
+    __tablename__ = 'notification_receipt'
+
+    notification_id = Field(Integer(), ForeignKey('notification.id'), primary_key=True)
+    member_id = Field(Integer(), ForeignKey('member.id'), primary_key=True)
+    read_at = Field(DateTime(), nullable=False)
@@ -1,14 +1,33 @@
+import functools
+import hashlib
+import hmac
 import time
 
 import binascii
 from base64 import b32encode
 
 import oath
+import redis
 from Crypto.Hash import SHA256
 from nanohttp.configuration import settings
+from restfulpy.logging_ import get_logger
+
+from stemerald.cache import redis_client
+
+logger = get_logger('OATH')
+
+
+@functools.lru_cache(maxsize=1024)
+def _get_ocra_client(seed, ocra_suite):
+    """
+    The OCRA client of the seed, which is stateless (unlike the server), so it is built once and reused.
+    """
+    return oath.OCRAChallengeResponseClient(binascii.unhexlify(seed), ocra_suite, ocra_suite)
 
 
 class Oath:
+    used_codes_prefix = 'oath:used-codes'
+
     def __init__(self, seed, derivate_seed_from=None):
         self.seed = seed
         self.window = settings.oath.window
@@ -20,11 +39,7 @@ class Oath:
             self.seed = self._derivate_seed(self.seed, derivate_seed_from)
 
     def generate(self, challenge):
-        ocra_client = oath.OCRAChallengeResponseClient(
-            binascii.unhexlify(self.seed),
-            self.ocra_suite,
-            self.ocra_suite
-        )
+        ocra_client = _get_ocra_client(self.seed, self.ocra_suite)
 
         kwargs = {'T': time.time(), 'T_precomputed': ''}
         rc = ocra_client.compute_response(challenge=challenge, **kwargs)
@@ -32,21 +47,51 @@ class Oath:
         return rc
 
     def verify(self, challenge, code):
-        for i in range(max(-divmod(time.time(), self.time_interval)[0], -self.window),
-                       self.window + 1):
-            d = (self.drift + i) * self.time_interval
-            ocra_server = oath.OCRAChallengeResponseServer(
-                binascii.unhexlify(self.seed),
-                self.ocra_suite,
-                self.ocra_suite
-            )
-            kwargs = {'T': time.time() + d, 'T_precomputed': ''}
-            ocra_server.compute_challenge()
-            ocra_server.challenge = challenge
-            if ocra_server.verify_response(response=code, **kwargs):
-                return True, self.drift + i
-
-        return False, 0
+        """
+        Checks the `code` against the responses of all of the time steps of the window. Each code is accepted just
+        once, see `_claim`.
+        """
+        drift = self._match(challenge, code)
+        if drift is None or not self._claim(challenge, code):
+            return False, 0
+
+        return True, drift
+
+    def _match(self, challenge, code):
+        """
+        :return: The drift of the time step which the `code` is the response of, or None
+        """
+        ocra_client = _get_ocra_client(self.seed, self.ocra_suite)
+        counter = int(time.time() // self.time_interval)
+        code = str(code).encode()
+
+        for i in range(max(-counter, -self.window), self.window + 1):
+            response = ocra_client.compute_response(challenge=challenge, T_precomputed=counter + self.drift + i)
+            if hmac.compare_digest(response.encode(), code):
+                return self.drift + i
+
+        return None
+
+    def _claim(self, challenge, code):
+        """
+        Remembers the used `code` as long as it may be valid, so it cannot be replayed.
+
+        :return: False if it is already used
+        """
+        key = '%s:%s' % (
+            self.used_codes_prefix,
+            hashlib.sha256(f'{self.seed}:{challenge}'.encode()).hexdigest()
+        )
+        try:
+            pipeline = redis_client.pipeline()
+            pipeline.sadd(key, code)
+            pipeline.expire(key, (2 * self.window + 1) * self.time_interval)
+            added, __ = pipeline.execute()
+        except redis.RedisError:
+            logger.exception('Cannot check whether the code is already used')
+            return True
+
+        return added == 1
 
     def verify_google_auth(self, code):
         # FIXME: Read from google auth configurations (and make configuration for google auth!)
@@ -63,6 +108,7 @@ class Oath:
         return is_valid, drift
 
     @staticmethod
+    @functools.lru_cache(maxsize=1024)
     def _derivate_seed(base_seed, second_factor):
         sha = SHA256.new()
         sha.update(second_factor.encode())
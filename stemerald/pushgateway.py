@@ -0,0 +1,308 @@
+import asyncio
+
+import ujson
+from aiohttp import web, WSMsgType, WSCloseCode
+from nanohttp import settings
+from restfulpy.logging_ import get_logger
+
+from stemerald.controllers.market import depth_to_dict, last_to_dict, market_deal_to_dict, status_to_dict
+from stemerald.registry import metadata_registry
+from stemerald.stexchange import async_stexchange_client
+
+logger = get_logger('PUSH_GATEWAY')
+
+CHANNELS = frozenset(('depth', 'last', 'status', 'deals'))
+
+
+def parse_channels(channels):
+    """
+    The requested channels (all of them if empty), raises `ValueError` for the unknown ones.
+    """
+    if not channels:
+        return CHANNELS
+
+    channels = frozenset(channels)
+    unknown = channels - CHANNELS
+    if unknown:
+        raise ValueError(f'Unknown channels: {", ".join(sorted(unknown))}')
+
+    return channels
+
+
+class Subscriber:
+    """
+    A connected client. The messages (`(channel, serialized message)`) of its subscriptions are queued for it, up to
+    `queue_size`; a client which does not keep up is dropped (`None` is queued for it) instead of slowing the others
+    down.
+    """
+
+    def __init__(self, queue_size):
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.markets = set()
+        self.dropped = False
+
+    def push(self, message):
+        if self.dropped:
+            return
+
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.dropped = True
+            # It is going to be disconnected, so the queued messages are useless
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+    async def get(self, timeout=None):
+        """
+        The next message, or `None` if it is dropped; raises `asyncio.TimeoutError` after `timeout` seconds.
+        """
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class MarketFeed:
+    """
+    Polls the engine for one market every `poll_gap` seconds, just while it has any subscribers. All of the channels
+    are fetched in one batch request, and each message is serialized once and pushed to all of the subscribers of
+    its channel.
+
+    The depth, last price and status are pushed just when they are changed, the deals are pushed as they are made
+    (the new ones). The last message of each channel (the recent deals for `deals`) is sent to the new subscribers
+    right away.
+    """
+
+    def __init__(self, gateway, market):
+        self.gateway = gateway
+        self.market = market
+        self.subscribers = {}  # subscriber: channels
+        self.messages = {}  # channel: the last message
+        self.recent_deals = []
+        self.last_deal_id = 0
+        self.task = None
+
+    def subscribe(self, subscriber, channels):
+        self.subscribers[subscriber] = channels
+        for channel in channels:
+            message = self.messages.get(channel)
+            if message is not None:
+                subscriber.push(message)
+
+        if self.task is None:
+            self.task = asyncio.ensure_future(self.run())
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.pop(subscriber, None)
+
+    async def run(self):
+        try:
+            while self.subscribers:
+                try:
+                    await self.poll()
+                except Exception:
+                    logger.exception(f'Error polling the market {self.market.name}')
+
+                await asyncio.sleep(self.gateway.poll_gap)
+        finally:
+            self.task = None
+            if not self.subscribers:
+                self.gateway.feeds.pop(self.market.name, None)
+
+    async def poll(self):
+        market_name = self.market.name
+        async with async_stexchange_client.batch() as batch:
+            depth = batch.order_depth(market_name, self.gateway.depth_limit, 0)
+            last = batch.market_last(market_name)
+            status = batch.market_status_today(market_name)
+            deals = batch.market_deals(market_name, self.gateway.deals_limit, self.last_deal_id)
+
+        for channel, item, to_dict in (
+                ('depth', depth, depth_to_dict),
+                ('last', last, last_to_dict),
+                ('status', status, status_to_dict),
+        ):
+            if item.error is not None:
+                logger.warning(f'Cannot poll the {channel} of the market {market_name}: {item.error}')
+                continue
+
+            message = self._serialize(channel, to_dict(self.market, item.result))
+            if message != self.messages.get(channel):
+                self.messages[channel] = message
+                self.publish(message)
+
+        if deals.error is not None:
+            logger.warning(f'Cannot poll the deals of the market {market_name}: {deals.error}')
+            return
+
+        new_deals = [
+            market_deal_to_dict(self.market, deal) for deal in deals.result if deal['id'] > self.last_deal_id
+        ]
+        if new_deals:
+            self.last_deal_id = max(deal['id'] for deal in new_deals)
+            self.recent_deals = (new_deals + self.recent_deals)[:self.gateway.deals_limit]
+            self.messages['deals'] = self._serialize('deals', self.recent_deals)
+            self.publish(self._serialize('deals', new_deals))
+
+    def _serialize(self, channel, data):
+        return channel, ujson.dumps({'market': self.market.name, 'channel': channel, 'data': data})
+
+    def publish(self, message):
+        channel = message[0]
+        for subscriber, channels in list(self.subscribers.items()):
+            if channel in channels:
+                subscriber.push(message)
+
+
+class PushGateway:
+    """
+    Pushes the market data (see `CHANNELS`) to the clients, instead of letting each one of them poll the market
+    APIs. Each market is polled once (see `MarketFeed`), no matter how many clients are subscribed to it.
+
+    * Server-Sent Events: `GET /markets/{market_name}/events?channels=depth,last`, one market per connection.
+    * WebSocket: `GET /websocket`, then sending `{"action": "subscribe", "market": "BTC_USD", "channels": ["depth"]}`
+      or `{"action": "unsubscribe", "market": "BTC_USD"}` for any number of markets.
+
+    The messages are the same as the ones of the market APIs:
+    `{"market": "BTC_USD", "channel": "depth", "data": {"asks": [...], "bids": [...]}}`
+
+    Usage:
+
+        web.run_app(PushGateway().create_application(), port=8082)
+
+    """
+
+    def __init__(self, poll_gap=1, depth_limit=10, deals_limit=50, queue_size=100, heartbeat=15, get_market=None):
+        self.poll_gap = poll_gap
+        self.depth_limit = depth_limit
+        self.deals_limit = deals_limit
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat
+        self.get_market = get_market or metadata_registry.get_market
+        self.feeds = {}
+
+    def subscribe(self, subscriber, market_name, channels):
+        market = self.get_market(market_name)
+        if market is None:
+            return False
+
+        feed = self.feeds.get(market.name)
+        if feed is None:
+            feed = self.feeds[market.name] = MarketFeed(self, market)
+
+        feed.subscribe(subscriber, channels)
+        subscriber.markets.add(market.name)
+        return True
+
+    def unsubscribe(self, subscriber, market_name=None):
+        for name in [market_name] if market_name is not None else list(subscriber.markets):
+            feed = self.feeds.get(name)
+            if feed is not None:
+                feed.unsubscribe(subscriber)
+            subscriber.markets.discard(name)
+
+    def create_application(self):
+        application = web.Application()
+        application.router.add_get('/markets/{market_name}/events', self.events)
+        application.router.add_get('/websocket', self.websocket)
+        application.on_shutdown.append(self._shutdown)
+        return application
+
+    async def _shutdown(self, application):
+        for feed in list(self.feeds.values()):
+            if feed.task is not None:
+                feed.task.cancel()
+        await async_stexchange_client.close()
+
+    async def events(self, request):
+        channels = request.query.get('channels')
+        try:
+            channels = parse_channels(channels.split(',') if channels else None)
+        except ValueError as e:
+            raise web.HTTPBadRequest(reason=str(e))
+
+        subscriber = Subscriber(self.queue_size)
+        if not self.subscribe(subscriber, request.match_info['market_name'], channels):
+            raise web.HTTPBadRequest(reason='Bad market')
+
+        try:
+            response = web.StreamResponse(headers={
+                'Content-Type': 'text/event-stream',
+                'Cache-Control': 'no-cache',
+                'X-Accel-Buffering': 'no',
+            })
+            await response.prepare(request)
+
+            while True:
+                try:
+                    message = await subscriber.get(self.heartbeat)
+                except asyncio.TimeoutError:
+                    await response.write(b': heartbeat\n\n')
+                    continue
+
+                if message is None:
+                    break
+
+                channel, data = message
+                await response.write(f'event: {channel}\ndata: {data}\n\n'.encode())
+
+        except ConnectionResetError:
+            pass
+
+        finally:
+            self.unsubscribe(subscriber)
+
+        return response
+
+    async def websocket(self, request):
+        ws = web.WebSocketResponse(heartbeat=self.heartbeat)
+        await ws.prepare(request)
+
+        subscriber = Subscriber(self.queue_size)
+        sender = asyncio.ensure_future(self._send(ws, subscriber))
+        try:
+            async for message in ws:
+                if message.type != WSMsgType.TEXT:
+                    continue
+
+                try:
+                    command = ujson.loads(message.data)
+                    action = command['action']
+                    market_name = command['market']
+                    channels = parse_channels(command.get('channels'))
+                except (ValueError, KeyError, TypeError):
+                    await ws.send_str(ujson.dumps({'error': 'bad-command'}))
+                    continue
+
+                if action == 'subscribe':
+                    if not self.subscribe(subscriber, market_name, channels):
+                        await ws.send_str(ujson.dumps({'error': 'bad-market', 'market': market_name}))
+                elif action == 'unsubscribe':
+                    self.unsubscribe(subscriber, market_name)
+                else:
+                    await ws.send_str(ujson.dumps({'error': 'bad-command'}))
+
+        finally:
+            sender.cancel()
+            self.unsubscribe(subscriber)
+
+        return ws
+
+    @staticmethod
+    async def _send(ws, subscriber):
+        while True:
+            message = await subscriber.get()
+            if message is None:
+                await ws.close(code=WSCloseCode.TRY_AGAIN_LATER, message=b'Too slow')
+                return
+
+            await ws.send_str(message[1])
+
+
+def create_push_gateway():
+    return PushGateway(
+        poll_gap=settings.push_gateway.poll_gap,
+        depth_limit=settings.push_gateway.depth_limit,
+        deals_limit=settings.push_gateway.deals_limit,
+        queue_size=settings.push_gateway.queue_size,
+        heartbeat=settings.push_gateway.heartbeat,
+    )
@@ -0,0 +1,137 @@
+import os
+import threading
+import time
+
+import redis
+from restfulpy.logging_ import get_logger
+from restfulpy.orm import session_factory
+from sqlalchemy.orm import joinedload, with_polymorphic
+
+from stemerald.cache import redis_client
+
+logger = get_logger('REGISTRY')
+
+
+class MetadataRegistry:
+    """
+    An in-process (per worker) copy of the rows which almost never change: currencies, markets and payment gateways.
+    All of them are loaded at once (on the first use) with their relationships resolved eagerly, so looking them up
+    costs no query at all.
+
+    The objects are detached from any session, so DO NOT modify them; query the row itself to edit it and then call
+    `invalidate` after the commit (e.g. using `call_after_commit`), which also lets the other workers know through
+    a redis channel.
+
+    """
+    channel = 'metadata-registry:invalidate'
+    reconnect_gap = 1  # Seconds
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._generation = 0
+        self._generation_lock = threading.Lock()
+        self._listener_pid = None
+
+    def _load(self):
+        from stemerald.models import Currency, Market, PaymentGateway
+
+        session = session_factory(expire_on_commit=False)
+        try:
+            currencies = session.query(with_polymorphic(Currency, '*')).all()
+            markets = session.query(Market) \
+                .options(joinedload(Market.base_currency), joinedload(Market.quote_currency)) \
+                .all()
+            payment_gateways = session.query(PaymentGateway).options(joinedload(PaymentGateway.fiat)).all()
+            session.expunge_all()
+        finally:
+            session.close()
+
+        logger.info(
+            f'Metadata registry loaded: {len(currencies)} currencies, {len(markets)} markets and '
+            f'{len(payment_gateways)} payment gateways'
+        )
+
+        return {
+            'currencies': {c.symbol: c for c in currencies},
+            'markets': {m.name: m for m in markets},
+            'payment_gateways': {p.name: p for p in payment_gateways},
+        }
+
+    @property
+    def snapshot(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            self._ensure_listener()
+            with self._lock:
+                snapshot = self._snapshot
+                if snapshot is None:
+                    generation = self._generation
+                    snapshot = self._load()
+                    # Not keeping it if it is invalidated while loading, it might be read before the change
+                    with self._generation_lock:
+                        if self._generation == generation:
+                            self._snapshot = snapshot
+        return snapshot
+
+    def _reset(self):
+        with self._generation_lock:
+            self._generation += 1
+            self._snapshot = None
+
+    def invalidate(self, publish=True):
+        self._reset()
+        if publish:
+            try:
+                redis_client.publish(self.channel, os.getpid())
+            except redis.RedisError:
+                logger.exception('Error publishing the metadata registry invalidation')
+
+    def _ensure_listener(self):
+        pid = os.getpid()
+        if self._listener_pid == pid:
+            return
+
+        self._listener_pid = pid
+        threading.Thread(target=self._listen, name='metadata-registry-listener', daemon=True).start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for __ in pubsub.listen():
+                    self._reset()
+
+            except redis.RedisError:
+                logger.exception('Metadata registry lost its redis subscription, reconnecting')
+                # Some invalidations might have been missed meanwhile
+                self._reset()
+                time.sleep(self.reconnect_gap)
+
+    @property
+    def currencies(self):
+        return list(self.snapshot['currencies'].values())
+
+    @property
+    def markets(self):
+        return list(self.snapshot['markets'].values())
+
+    @property
+    def payment_gateways(self):
+        return list(self.snapshot['payment_gateways'].values())
+
+    def get_currency(self, symbol, type_=None):
+        currency = self.snapshot['currencies'].get(symbol)
+        if currency is None or (type_ is not None and not isinstance(currency, type_)):
+            return None
+        return currency
+
+    def get_market(self, name):
+        return self.snapshot['markets'].get(name)
+
+    def get_payment_gateway(self, name):
+        return self.snapshot['payment_gateways'].get(name)
+
+
+metadata_registry = MetadataRegistry()
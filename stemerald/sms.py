@@ -1,8 +1,13 @@
-import requests
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 from nanohttp import settings
 from restfulpy.logging_ import get_logger
 from restfulpy.utils import construct_class_by_name
 
+from stemerald.helpers import create_pooled_session
+
 logger = get_logger('SMS')
 
 
@@ -11,6 +16,18 @@ class SmsSendingError(Exception):
         logger.info(f'Error sending sms: {response.text}')
 
 
+class SmsMessage:
+    """
+    A text message, or a verification code if the `template` is given.
+    """
+
+    def __init__(self, to, text=None, code=None, template=None):
+        self.to = to
+        self.text = text
+        self.code = code
+        self.template = template
+
+
 class SmsProvider:
     def send(self, to_number, text):
         logger.info(
@@ -23,6 +40,27 @@ class SmsProvider:
             (to_number, token, template, self.__class__.__name__)
         )
 
+    def send_message(self, message: SmsMessage):
+        if message.template is not None:
+            self.send_as_verification_code(message.to, message.code, message.template)
+        else:
+            self.send(message.to, message.text)
+
+    def send_many(self, messages):
+        """
+        Sends the `messages`, a failed one does not stop the others.
+
+        :return: The errors of the messages, respectively (None for the sent ones)
+        """
+        return [self._try_send_message(message) for message in messages]
+
+    def _try_send_message(self, message):
+        try:
+            self.send_message(message)
+        except Exception as ex:
+            logger.exception(f'Error sending sms to: {message.to}')
+            return ex
+
 
 class ConsoleSmsProvider(SmsProvider):  # pragma: no cover
     def send(self, to_number, text):
@@ -36,9 +74,17 @@ class ConsoleSmsProvider(SmsProvider):  # pragma: no cover
 
 
 class KavenegarSmsProvider(SmsProvider):
-    @classmethod
-    def _request(cls, url, data):
-        response = requests.request('POST', url, params=data)
+    """
+    Keeps up to `sms.pool_size` connections to kavenegar alive, which `send_many` sends through concurrently.
+    """
+
+    def __init__(self):
+        self.pool_size = settings.sms.pool_size
+        self.timeout = (settings.sms.connect_timeout, settings.sms.read_timeout)
+        self.session = create_pooled_session(pool_size=self.pool_size)
+
+    def _request(self, url, data):
+        response = self.session.post(url, params=data, timeout=self.timeout)
 
         if response.status_code != 200:
             raise SmsSendingError(response)
@@ -57,7 +103,26 @@ class KavenegarSmsProvider(SmsProvider):
             'template': template,
         })
 
+    def send_many(self, messages):
+        with ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix='sms') as executor:
+            return list(executor.map(self._try_send_message, messages))
+
+
+_providers = {}
+_providers_lock = threading.Lock()
+
 
-# FIXME: DO NOT create this object every time
 def create_sms_provider() -> SmsProvider:
-    return construct_class_by_name(settings.sms.provider)
+    """
+    The provider of the `sms.provider` setting, which is built once per worker process (so it keeps its connections
+    alive) and shared between the threads.
+    """
+    key = (os.getpid(), settings.sms.provider)
+    provider = _providers.get(key)
+    if provider is None:
+        with _providers_lock:
+            provider = _providers.get(key)
+            if provider is None:
+                provider = _providers[key] = construct_class_by_name(settings.sms.provider)
+
+    return provider
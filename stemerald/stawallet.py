@@ -1,8 +1,9 @@
-import requests
+import os
 
 from restfulpy.logging_ import get_logger
+from urllib3.util.retry import Retry
 
-from stemerald.helpers import DeferredObject
+from stemerald.helpers import DeferredObject, create_pooled_session
 
 logger = get_logger('STAWALLET_REST_CLIENT')
 
@@ -13,29 +14,71 @@ WITHDRAWS_URL = "whitdraws"
 QUOTES_URL = "quotes"
 
 
+def _create_get_retry(total, backoff_factor):
+    """
+    Retries the failed connections, and just the idempotent (GET) requests on the read errors and the gateway
+    errors.
+    """
+    kwargs = dict(
+        total=total,
+        backoff_factor=backoff_factor,
+        status_forcelist=(502, 503, 504),
+        raise_on_status=False,
+    )
+    try:
+        return Retry(allowed_methods=frozenset({'GET'}), **kwargs)
+    except TypeError:  # pragma: no cover
+        # urllib3 < 1.26
+        return Retry(method_whitelist=frozenset({'GET'}), **kwargs)
+
+
 class StawalletClient:
 
-    def __init__(self, server_url, headers=None):
+    def __init__(self, server_url, headers=None, pool_size=10, pool_block=False, connect_timeout=3,
+                 read_timeout=10, get_retries=2, retry_backoff=0.2):
         self.server_url = server_url
         self.headers = {'content-type': 'application/x-www-form-urlencoded'}
         self.headers.update(headers or {})
 
+        self.pool_size = pool_size
+        self.pool_block = pool_block
+        self.timeout = (connect_timeout, read_timeout)
+        self.get_retries = get_retries
+        self.retry_backoff = retry_backoff
+
+        self._session = None
+        self._session_owner = None
+
+    @property
+    def session(self):
+        # Per process, like `StexchangeClient.session`
+        owner = os.getpid()
+        if self._session is None or self._session_owner != owner:
+            self._session = create_pooled_session(
+                self.pool_size,
+                pool_block=self.pool_block,
+                max_retries=_create_get_retry(self.get_retries, self.retry_backoff),
+                headers=self.headers
+            )
+            self._session_owner = owner
+        return self._session
+
     def _execute(self, method, url, query_string: dict = None, body: dict = None):
         url = '/'.join([self.server_url, url])
 
         logger.debug(f"Requesting {method} over {url} with query: {query_string} with body: {body}")
 
         try:
-            response = requests.request(
+            response = self.session.request(
                 params=query_string,
                 method=method,
                 url=url,
                 data=body,
-                headers=self.headers
+                timeout=self.timeout
             )
 
-            print(response.url)
-            print(response.text)
+            logger.debug(f'Response of {method} {response.url}: {response.status_code} {response.text}')
+
             if response.status_code == 200:
                 return response.json()
 
@@ -73,7 +116,7 @@ class StawalletClient:
         return self._execute('get', url, query_string=query_string)
 
     def get_deposit(self, wallet_id, deposit_id):
-        url = f'{WALLETS_URL}/{wallet_id}/{DEPOSITS_URL}/${deposit_id}'
+        url = f'{WALLETS_URL}/{wallet_id}/{DEPOSITS_URL}/{deposit_id}'
         return self._execute('get', url)
 
     def get_withdraws(self, wallet_id, user_id, page=0):
@@ -82,7 +125,7 @@ class StawalletClient:
         return self._execute('get', url, query_string=query_string)
 
     def get_withdraw(self, wallet_id, withdraw_id):
-        url = f'{WALLETS_URL}/{wallet_id}/{WITHDRAWS_URL}/${withdraw_id}'
+        url = f'{WALLETS_URL}/{wallet_id}/{WITHDRAWS_URL}/{withdraw_id}'
         return self._execute('get', url)
 
     def schedule_withdraw(
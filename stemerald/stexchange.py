@@ -1,3 +1,9 @@
+import asyncio
+import itertools
+import os
+import threading
+
+import aiohttp
 import ujson
 import time
 
@@ -6,7 +12,7 @@ from nanohttp import *
 
 from restfulpy.logging_ import get_logger
 
-from stemerald.helpers import DeferredObject
+from stemerald.helpers import DeferredObject, create_pooled_session
 
 logger = get_logger('STEXCHANGE_RPC_CLIENT')
 
@@ -16,30 +22,93 @@ logger = get_logger('STEXCHANGE_RPC_CLIENT')
 
 
 class StexchangeClient:
-    def __init__(self, server_url, headers=None):
+    def __init__(self, server_url, headers=None, pool_size=10, pool_block=False, connect_timeout=3,
+                 read_timeout=10):
         self.server_url = server_url
         self.headers = {'content-type': 'application/json'}
         self.headers.update(headers or {})
-        self.request_id = 0
+        self._request_ids = itertools.count(1)
+
+        self.pool_size = pool_size
+        self.pool_block = pool_block
+        self.timeout = (connect_timeout, read_timeout)
+
+        self._local = threading.local()
+        self._session = None
+        self._session_owner = None
+        self._stats_lock = threading.Lock()
+        self._in_flight = 0
+        self._stats = {
+            'requests': 0,
+            'errors': 0,
+            'timeouts': 0,
+            'saturated': 0,
+            'peakInFlight': 0,
+        }
+
+    @property
+    def session(self):
+        # The session is (re)created lazily per process, so a forked worker (e.g. gunicorn with `--preload`) never
+        # shares the parent's sockets.
+        owner = os.getpid()
+        if self._session is None or self._session_owner != owner:
+            self._session = create_pooled_session(self.pool_size, pool_block=self.pool_block, headers=self.headers)
+            self._session_owner = owner
+        return self._session
+
+    def pool_stats(self):
+        with self._stats_lock:
+            result = dict(self._stats)
+            result['inFlight'] = self._in_flight
+        result['poolSize'] = self.pool_size
+        return result
+
+    def _acquire(self):
+        with self._stats_lock:
+            self._in_flight += 1
+            self._stats['requests'] += 1
+            self._stats['peakInFlight'] = max(self._stats['peakInFlight'], self._in_flight)
+            if self._in_flight > self.pool_size:
+                self._stats['saturated'] += 1
+
+    def _release(self, error=None):
+        with self._stats_lock:
+            self._in_flight -= 1
+            if error is not None:
+                self._stats['errors'] += 1
+                if isinstance(error, (requests.Timeout, asyncio.TimeoutError)):
+                    self._stats['timeouts'] += 1
+
+    def _post(self, payload, timeout=None, check_status=False):
+        self._acquire()
+        try:
+            response = self.session.post(self.server_url, data=payload, timeout=timeout or self.timeout)
+            if check_status:
+                response.raise_for_status()
+            response = response.json()
+        except Exception as e:
+            self._release(e)
+            raise
+        self._release()
+        return response
 
     def _next_request_id(self):
-        self.request_id += 1
-        return self.request_id
+        # The client is shared between the threads, and the batch responses are matched by id, so the ids are taken
+        # from a counter instead of `+= 1`, which is not atomic
+        return next(self._request_ids)
 
-    def _execute(self, method, params, error_mapper=None):
+    def _build_request(self, method, params, error_mapper=None):
         _id = self._next_request_id()
         params = list(map(lambda x: x if x is not None else "null", params))
-        payload = ujson.dumps({"method": method, "params": params, "id": _id})
 
         logger.debug(f"Requesting {method} with id:{_id} with parameters: {'.'.join(str(params))}")
 
-        try:
-            response = requests.post(self.server_url, data=payload, headers=self.headers).json()
-        except Exception as e:
-            raise StexchangeUnknownException(f"Request error: {str(e)}")
+        return {"method": method, "params": params, "id": _id}, error_mapper
 
+    @staticmethod
+    def _parse_response(response, error_mapper=None):
         if response["error"] is not None and len(response["error"]) > 0:
-            error_mapper = error_mapper or {}
+            error_mapper = dict(error_mapper or {})
             error_mapper.update(STEXCHANEG_GENERAL_ERROR_CODE_MAP)
             error = response["error"]
             raise (
@@ -54,6 +123,73 @@ class StexchangeClient:
         else:
             return StexchangeUnknownException("Neither error and result fields available")
 
+    def _execute(self, method, params, error_mapper=None, timeout=None):
+        request, error_mapper = self._build_request(method, params, error_mapper)
+
+        batch = getattr(self._local, 'batch', None)
+        if batch is not None:
+            return batch.enqueue(request, error_mapper)
+
+        return self._send(request, error_mapper, timeout=timeout)
+
+    def _send(self, request, error_mapper=None, timeout=None):
+        try:
+            response = self._post(ujson.dumps(request), timeout=timeout)
+        except requests.Timeout:
+            raise ServiceTimoutException(request['id'])
+        except Exception as e:
+            raise StexchangeUnknownException(f"Request error: {str(e)}")
+
+        return self._parse_response(response, error_mapper)
+
+    def _execute_batch(self, items):
+        if len(items) == 0:
+            return
+
+        payload = ujson.dumps([dict(jsonrpc='2.0', **item.request) for item in items])
+
+        try:
+            responses = self._post(payload, check_status=True)
+        except requests.Timeout:
+            raise ServiceTimoutException(','.join(str(item.request['id']) for item in items))
+        except (requests.HTTPError, ValueError):
+            # Rejected (e.g. 400) or answered by a non-JSON body
+            responses = None
+        except Exception as e:
+            raise StexchangeUnknownException(f"Request error: {str(e)}")
+
+        if not isinstance(responses, list):
+            # The server does not support batch requests, so fall back to one request per call
+            logger.warning('Batch request is not supported by the server, falling back to sequential requests')
+            for item in items:
+                item.resolve(lambda: self._send(item.request, item.error_mapper))
+            return
+
+        self._resolve_batch(items, responses)
+
+    def _resolve_batch(self, items, responses):
+        responses = {response.get('id'): response for response in responses}
+        for item in items:
+            response = responses.get(item.request['id'])
+            if response is None:
+                item.error = StexchangeUnknownException(f"id: {item.request['id']} Missing from the batch response")
+                continue
+            item.resolve(lambda: self._parse_response(response, item.error_mapper))
+
+    def batch(self):
+        """
+        Packs the calls into a single JSON-RPC 2.0 batch request, so N calls cost one round trip:
+
+            with stexchange_client.batch() as batch:
+                batch.asset_list()
+                batch.balance_query(user_id)
+
+            assets, balances = batch.results
+
+        Each call is resolved (and its error mapped) individually; see `StexchangeBatch`.
+        """
+        return StexchangeBatch(self)
+
     """
         Asset APIs:
     """
@@ -665,6 +801,191 @@ class BalanceNotEnoughException(StexchangeException):
         super(BalanceNotEnoughException, self).__init__(f"id: ${_id} balance not enough")
 
 
+class StexchangeBatchItem:
+    def __init__(self, request=None, error_mapper=None):
+        self.request = request
+        self.error_mapper = error_mapper
+        self.result = None
+        self.error = None
+
+    @property
+    def is_pending(self):
+        return self.request is not None and self.result is None and self.error is None
+
+    def resolve(self, resolver):
+        try:
+            self.result = resolver()
+        except StexchangeException as e:
+            self.error = e
+
+    def get(self):
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class StexchangeBatch:
+    """
+    Records the calls made on it (using the same method names of `StexchangeClient`) and sends them all at once
+    when the `with` block exits.
+
+    * `items`: One `StexchangeBatchItem` per call, in order, each one holding either a `result` or an `error`
+      (mapped by the method's own error map and `STEXCHANEG_GENERAL_ERROR_CODE_MAP`).
+    * `results`: List of the results in order, raises the first error if any.
+
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self._current = None
+        self.items = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is not None:
+            return False
+        self.flush()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is not None:
+            return False
+        await self.flush()
+
+    def __getattr__(self, name):
+        method = getattr(self._client, name)
+
+        def record(*args, **kwargs):
+            item = StexchangeBatchItem()
+            self._client._local.batch = self
+            self._current = item
+            try:
+                result = method(*args, **kwargs)
+                if result is not item:
+                    # Not recorded by `_execute` (e.g. a mockup), so it is already resolved
+                    item.result = result
+            except StexchangeException as e:
+                item.error = e
+            finally:
+                self._client._local.batch = None
+            self.items.append(item)
+            return item
+
+        return record
+
+    def enqueue(self, request, error_mapper):
+        item = self._current
+        item.request = request
+        item.error_mapper = error_mapper
+        return item
+
+    @property
+    def pending_items(self):
+        return [item for item in self.items if item.is_pending]
+
+    def flush(self):
+        """
+        Sends the pending calls; returns a coroutine when the client is an `AsyncStexchangeClient`.
+        """
+        return self._client._execute_batch(self.pending_items)
+
+    @property
+    def results(self):
+        return [item.get() for item in self.items]
+
+
+class AsyncStexchangeClient(StexchangeClient):
+    """
+    The asyncio flavour of `StexchangeClient`: Exactly the same methods (and exceptions), but each one returns an
+    awaitable, so many calls can be fanned out concurrently over a shared (per process and event loop) connection pool:
+
+        last, depth = await asyncio.gather(
+            async_stexchange_client.market_last(market),
+            async_stexchange_client.order_depth(market, 10, 0),
+        )
+
+    Batches are supported as well, using `async with async_stexchange_client.batch() as batch:`.
+    """
+
+    @property
+    def session(self):
+        owner = (os.getpid(), asyncio.get_event_loop())
+        if self._session is None or self._session.closed or self._session_owner != owner:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=aiohttp.ClientTimeout(sock_connect=self.timeout[0], sock_read=self.timeout[1]),
+                headers=self.headers,
+                json_serialize=ujson.dumps,
+            )
+            self._session_owner = owner
+        return self._session
+
+    @staticmethod
+    def _timeout_kwargs(timeout):
+        # Passing `timeout=None` to aiohttp disables all of the timeouts, including the ones of the session
+        if not timeout:
+            return {}
+        return {'timeout': aiohttp.ClientTimeout(sock_connect=timeout[0], sock_read=timeout[1])}
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def _post(self, payload, timeout=None, check_status=False):
+        self._acquire()
+        try:
+            async with self.session.post(self.server_url, data=payload, **self._timeout_kwargs(timeout)) as response:
+                if check_status:
+                    response.raise_for_status()
+                result = await response.json(loads=ujson.loads, content_type=None)
+        except Exception as e:
+            self._release(e)
+            raise
+        self._release()
+        return result
+
+    async def _send(self, request, error_mapper=None, timeout=None):
+        try:
+            response = await self._post(ujson.dumps(request), timeout=timeout)
+        except asyncio.TimeoutError:
+            raise ServiceTimoutException(request['id'])
+        except Exception as e:
+            raise StexchangeUnknownException(f"Request error: {str(e)}")
+
+        return self._parse_response(response, error_mapper)
+
+    async def _execute_batch(self, items):
+        if len(items) == 0:
+            return
+
+        payload = ujson.dumps([dict(jsonrpc='2.0', **item.request) for item in items])
+
+        try:
+            responses = await self._post(payload, check_status=True)
+        except asyncio.TimeoutError:
+            raise ServiceTimoutException(','.join(str(item.request['id']) for item in items))
+        except (aiohttp.ClientResponseError, ValueError):
+            # Rejected (e.g. 400) or answered by a non-JSON body
+            responses = None
+        except Exception as e:
+            raise StexchangeUnknownException(f"Request error: {str(e)}")
+
+        if not isinstance(responses, list):
+            logger.warning('Batch request is not supported by the server, falling back to sequential requests')
+            for item in items:
+                try:
+                    item.result = await self._send(item.request, item.error_mapper)
+                except StexchangeException as e:
+                    item.error = e
+            return
+
+        self._resolve_batch(items, responses)
+
+
 class MockStexchangeClient(StexchangeClient):
 
     def balance_query(self, user_id, *asset_name):
@@ -811,6 +1132,7 @@ if __name__ == '__main__':
     """
 
 stexchange_client: StexchangeClient = DeferredObject(StexchangeClient)
+async_stexchange_client: AsyncStexchangeClient = DeferredObject(AsyncStexchangeClient)
 
 
 def stexchange_http_exception_handler(e):
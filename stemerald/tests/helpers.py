@@ -4,6 +4,8 @@ from restfulpy.messaging import Messenger
 from restfulpy.testing import ModelRestCrudTestCase
 
 from stemerald import stemerald
+from stemerald.cache import BalanceCache, redis_client
+from stemerald.registry import metadata_registry
 from stemerald.sms import SmsProvider
 
 
@@ -24,6 +26,19 @@ class WebTestCase(ModelRestCrudTestCase):
         
         """)
 
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # The database is re-created for each test case
+        metadata_registry.invalidate(publish=False)
+
+        # So are the ids of the members
+        authenticator = cls.application.__authenticator__
+        for key in authenticator.redis.scan_iter(authenticator.member_claims_key % '*'):
+            authenticator.redis.delete(key)
+        for key in redis_client.scan_iter(f'{BalanceCache.prefix}:*'):
+            redis_client.delete(key)
+
     def login(self, email, password):
         result, metadata = self.request(None, 'POST', '/apiv2/sessions', doc=False, params={
             'email': email,
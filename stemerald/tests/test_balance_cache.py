@@ -0,0 +1,42 @@
+from stemerald.cache import balance_cache
+from stemerald.stexchange import StexchangeClient, stexchange_client
+from stemerald.tests.helpers import WebTestCase
+
+
+class BalanceCacheTestCase(WebTestCase):
+
+    @classmethod
+    def mockup(cls):
+        cls._flush_redis_db()
+
+        class MockStexchangeClient(StexchangeClient):
+            def __init__(self, headers=None):
+                super().__init__("", headers)
+                self.balance_calls = 0
+                self.available = 10
+
+            def balance_query(self, *args, **kwargs):
+                self.balance_calls += 1
+                return {'TESTNET3': {'available': str(self.available), 'freeze': '0'}}
+
+        cls.mock_client = MockStexchangeClient()
+        stexchange_client._set_instance(cls.mock_client)
+
+    def test_get_and_invalidate(self):
+        self.assertEqual(balance_cache.get(1)['TESTNET3']['available'], '10')
+        self.assertEqual(balance_cache.get(1)['TESTNET3']['available'], '10')
+        self.assertEqual(self.mock_client.balance_calls, 1)
+
+        # Another user
+        balance_cache.get(2)
+        self.assertEqual(self.mock_client.balance_calls, 2)
+
+        self.mock_client.available = 7
+        balance_cache.invalidate(1)
+        self.assertEqual(balance_cache.get(1)['TESTNET3']['available'], '7')
+        self.assertEqual(balance_cache.get(1)['TESTNET3']['available'], '7')
+        self.assertEqual(self.mock_client.balance_calls, 3)
+
+        # The other users are not touched
+        balance_cache.get(2)
+        self.assertEqual(self.mock_client.balance_calls, 3)
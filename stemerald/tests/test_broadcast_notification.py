@@ -0,0 +1,71 @@
+from restfulpy.taskqueue import Task
+from restfulpy.testing import FormParameter
+
+from stemerald.models import Admin, Client, Notification, NotificationReceipt
+from stemerald.tests.helpers import WebTestCase, As
+
+
+class BroadcastNotificationTestCase(WebTestCase):
+    url = '/apiv2/notifications'
+
+    # noinspection PyArgumentList
+    @classmethod
+    def mockup(cls):
+        admin1 = Admin()
+        admin1.email = 'admin1@test.com'
+        admin1.password = '123456'
+        admin1.is_active = True
+        cls.session.add(admin1)
+
+        for i in (1, 2):
+            client = Client()
+            client.email = f'client{i}@test.com'
+            client.password = '123456'
+            client.is_active = True
+            cls.session.add(client)
+
+        cls.session.flush()
+        cls.session.add(Notification(member_id=client.id, title='Private', description='Just for client2'))
+        cls.session.commit()
+
+    def test_broadcast(self):
+        tasks_before = self.session.query(Task).count()
+
+        # 1. Broadcast
+        self.login('admin1@test.com', '123456')
+        response, ___ = self.request(
+            As.admin, 'CREATE', self.url,
+            params=[
+                FormParameter('title', 'Maintenance'),
+                FormParameter('description', 'The exchange will be down for an hour'),
+            ]
+        )
+        notification_id = response['id']
+        self.assertIsNone(response['memberId'])
+        self.assertEqual(self.session.query(Task).count(), tasks_before + 1)
+        self.logout()
+
+        # 2. Read by client1
+        self.login('client1@test.com', '123456')
+        response, ___ = self.request(As.client, 'GET', self.url)
+        self.assertEqual([n['id'] for n in response], [notification_id])
+        self.assertIsNone(response[0]['readAt'])
+
+        response, ___ = self.request(As.client, 'READ', f'{self.url}/{notification_id}')
+        self.assertIsNotNone(response['readAt'])
+
+        # Reading again does nothing
+        self.request(As.client, 'READ', f'{self.url}/{notification_id}')
+        self.assertEqual(self.session.query(NotificationReceipt).count(), 1)
+
+        response, ___ = self.request(As.client, 'GET', self.url)
+        self.assertIsNotNone(response[0]['readAt'])
+        self.logout()
+
+        # 3. Not read by client2, which sees its own notification too
+        self.login('client2@test.com', '123456')
+        response, ___ = self.request(As.client, 'GET', self.url)
+        self.assertEqual(len(response), 2)
+        broadcast = next(n for n in response if n['id'] == notification_id)
+        self.assertIsNone(broadcast['readAt'])
+        self.logout()
@@ -12,6 +12,9 @@ class ClientPhoneVerificationTestCase(WebTestCase):
 
     @classmethod
     def mockup(cls):
+        # The used codes are remembered
+        cls._flush_redis_db()
+
         client1 = Client()
         client1.email = 'client1@test.com'
         client1.password = '123456'
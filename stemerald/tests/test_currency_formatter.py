@@ -0,0 +1,55 @@
+import random
+import unittest
+from decimal import Decimal
+
+from stemerald.models.currencies import Cryptocurrency, CurrencyFormatter
+
+
+def legacy_normalized_to_output(currency, number):
+    if number is None:
+        return None
+    if not isinstance(number, Decimal):
+        number = Decimal(number)
+
+    return ('{:.' + str(max(0, -currency.smallest_unit_scale)) + 'f}') \
+        .format(number.scaleb(- currency.normalization_scale))
+
+
+class CurrencyFormatterTestCase(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(0)
+        self.values = [
+            None, 0, 3, '0', '-0', '-5.5', '1E+5', '0.00000001', '1e-30',
+            '123456789012345678901234567890.123456789', Decimal('7.125'), 2.675
+        ] + [
+            str(Decimal(random.randint(-10 ** 20, 10 ** 20)).scaleb(-random.randint(0, 20))) for __ in range(1000)
+        ]
+
+    def test_exactness(self):
+        for smallest_unit_scale in range(-18, 3):
+            for normalization_scale in (-8, -1, 0, 2):
+                currency = Cryptocurrency(
+                    symbol='BTC',
+                    smallest_unit_scale=smallest_unit_scale,
+                    normalization_scale=normalization_scale
+                )
+                expected = [legacy_normalized_to_output(currency, v) for v in self.values]
+
+                self.assertEqual([currency.normalized_to_output(v) for v in self.values], expected)
+                self.assertEqual(currency.formatter.format_many(self.values), expected)
+
+    def test_cache(self):
+        currency = Cryptocurrency(symbol='BTC', smallest_unit_scale=-8, normalization_scale=0)
+        formatter = currency.formatter
+        self.assertIsInstance(formatter, CurrencyFormatter)
+        self.assertIs(currency.formatter, formatter)
+        self.assertEqual(currency.normalized_to_output('1.5'), '1.50000000')
+
+        currency.smallest_unit_scale = -2
+        self.assertIsNot(currency.formatter, formatter)
+        self.assertEqual(currency.normalized_to_output('1.5'), '1.50')
+
+
+if __name__ == '__main__':  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+from unittest import mock
+
+from stemerald import firebase
+from stemerald.firebase import send_multicast, MULTICAST_MAX_TOKENS
+
+
+class StaleTokenError(Exception):
+    code = 'registration-token-not-registered'
+
+
+class SendResponse:
+    def __init__(self, exception=None):
+        self.success = exception is None
+        self.exception = exception
+
+
+class BatchResponse:
+    def __init__(self, responses):
+        self.responses = responses
+        self.success_count = len([r for r in responses if r.success])
+
+
+class FirebaseMulticastTestCase(unittest.TestCase):
+
+    def test_send_multicast(self):
+        calls = []
+
+        def send(message):
+            calls.append(message.tokens)
+            return BatchResponse([
+                SendResponse(StaleTokenError() if t.startswith('stale') else None) for t in message.tokens
+            ])
+
+        tokens = [f'token-{i}' for i in range(MULTICAST_MAX_TOKENS + 10)] + ['stale-1', 'stale-2']
+        with mock.patch.object(firebase.messaging, 'send_each_for_multicast', send, create=True):
+            stale_tokens = send_multicast(tokens, title='Title', body='Body')
+
+        self.assertEqual([len(c) for c in calls], [MULTICAST_MAX_TOKENS, 12])
+        self.assertEqual(stale_tokens, {'stale-1', 'stale-2'})
+
+
+if __name__ == '__main__':  # pragma: no cover
+    unittest.main()
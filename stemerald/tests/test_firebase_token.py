@@ -0,0 +1,43 @@
+import unittest
+from unittest import mock
+
+from stemerald import firebase
+from stemerald.firebase import AccessTokenCache
+
+
+class AccessTokenInfo:
+    def __init__(self, access_token, expires_in):
+        self.access_token = access_token
+        self.expires_in = expires_in
+
+
+class AccessTokenCacheTestCase(unittest.TestCase):
+
+    def test_access_token_cache(self):
+        credentials = mock.Mock()
+        credentials.get_access_token.side_effect = [AccessTokenInfo('token-1', 3600), AccessTokenInfo('token-2', 3600)]
+        cache = AccessTokenCache(refresh_margin=300)
+
+        with mock.patch.object(firebase, 'settings'), \
+                mock.patch.object(firebase, 'ServiceAccountCredentials') as service_account_credentials, \
+                mock.patch.object(firebase.time, 'time') as time_:
+            service_account_credentials.from_json_keyfile_name.return_value = credentials
+
+            time_.return_value = 1000
+            self.assertEqual(cache.get(), 'token-1')
+
+            # Cached until shortly before the expiry
+            time_.return_value = 1000 + 3600 - 301
+            self.assertEqual(cache.get(), 'token-1')
+            self.assertEqual(credentials.get_access_token.call_count, 1)
+
+            time_.return_value = 1000 + 3600 - 299
+            self.assertEqual(cache.get(), 'token-2')
+            self.assertEqual(credentials.get_access_token.call_count, 2)
+
+            # The service account key is read once
+            self.assertEqual(service_account_credentials.from_json_keyfile_name.call_count, 1)
+
+
+if __name__ == '__main__':  # pragma: no cover
+    unittest.main()
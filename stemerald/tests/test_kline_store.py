@@ -0,0 +1,141 @@
+from unittest import mock
+
+from stemerald.cache import redis_client
+from stemerald.klines import kline_store, aggregate_klines
+from stemerald.models import Cryptocurrency, Market
+from stemerald.stexchange import StexchangeClient, stexchange_client
+from stemerald.tests.helpers import WebTestCase, As
+
+# A monday, far enough in the past to have all of its candles closed
+DAY = 1546819200
+
+
+def candle(time_):
+    price = str(time_ % 1000)
+    return [time_, price, price, price, price, '1', '2', 'TESTNET3_RINKEBY']
+
+
+class KlineStoreTestCase(WebTestCase):
+    url = '/apiv2/markets'
+
+    # noinspection PyArgumentList
+    @classmethod
+    def mockup(cls):
+        cls._flush_redis_db()
+
+        testnet = Cryptocurrency(symbol='TESTNET3', name='TESTNET3', wallet_id='TESTNET3')
+        rinkeby = Cryptocurrency(symbol='RINKEBY', name='RINKEBY', wallet_id='RINKEBY')
+        cls.session.add(Market(name='TESTNET3_RINKEBY', base_currency=rinkeby, quote_currency=testnet))
+
+        cls.session.commit()
+
+        class MockStexchangeClient(StexchangeClient):
+            def __init__(self, headers=None):
+                super().__init__("", headers)
+                self.kline_calls = []
+                self.offset = 0
+                self.empty = False
+
+            def market_kline(self, market, start, end, interval):
+                self.kline_calls.append((start, end, interval))
+                if self.empty:
+                    return []
+                return [candle(t + self.offset) for t in range(start // interval * interval, end + 1, interval)]
+
+        cls.mock_client = MockStexchangeClient()
+        stexchange_client._set_instance(cls.mock_client)
+
+    def test_kline_store(self):
+        mock_client = self.mock_client
+        query_string = {'interval': 3600, 'start': DAY, 'end': DAY + 12 * 3600 - 1}
+
+        # 1. The first request reaches the engine
+        response, ___ = self.request(
+            As.anonymous, 'KLINE', f'{self.url}/TESTNET3_RINKEBY', query_string=query_string
+        )
+        self.assertEqual(len(response), 12)
+        self.assertEqual(len(mock_client.kline_calls), 1)
+
+        # 2. The same candles are served from the store
+        response, ___ = self.request(
+            As.anonymous, 'KLINE', f'{self.url}/TESTNET3_RINKEBY', query_string=query_string
+        )
+        self.assertEqual(len(response), 12)
+        self.assertEqual(len(mock_client.kline_calls), 1)
+
+        # 3. Just the missing tail is fetched
+        mock_client.kline_calls.clear()
+        self.assertEqual(len(kline_store.get('TESTNET3_RINKEBY', DAY, DAY + 86400 - 1, 3600)), 24)
+        self.assertEqual(mock_client.kline_calls, [(DAY + 12 * 3600, DAY + 86400 - 1, 3600)])
+
+        # 4. The day is derived from the stored hours, once the engine is known to align the days to the epoch
+        kline_store.get('TESTNET3_RINKEBY', DAY - 86400, DAY - 1, 86400)
+        mock_client.kline_calls.clear()
+        days = kline_store.get('TESTNET3_RINKEBY', DAY, DAY, 86400)
+        self.assertEqual(mock_client.kline_calls, [])
+        self.assertEqual(days, aggregate_klines([candle(DAY + i * 3600) for i in range(24)], 86400))
+        self.assertEqual(days[0][5], '24')
+
+    def test_unaligned(self):
+        # Weeks which start on mondays
+        self.mock_client.offset = 4 * 86400
+        try:
+            week = 7 * 86400
+            expected = self.mock_client.market_kline('TESTNET3_RINKEBY', DAY - 10 * week, DAY, week)
+
+            self.assertEqual(kline_store.get('TESTNET3_RINKEBY', DAY - 10 * week, DAY, week), expected)
+            self.assertFalse(redis_client.exists(f'{kline_store.prefix}:TESTNET3_RINKEBY:{week}'))
+
+            # Served by the engine directly from now on
+            self.assertEqual(kline_store.get('TESTNET3_RINKEBY', DAY - 10 * week, DAY, week), expected)
+            self.assertFalse(redis_client.exists(f'{kline_store.prefix}:TESTNET3_RINKEBY:{week}'))
+        finally:
+            self.mock_client.offset = 0
+
+    def test_empty(self):
+        self.mock_client.empty = True
+        try:
+            self.mock_client.kline_calls.clear()
+            for __ in range(2):
+                self.assertEqual(kline_store.get('TESTNET3_RINKEBY', DAY - 60 * 60, DAY - 1, 60), [])
+
+            # Not claimed as covered
+            self.assertEqual(len(self.mock_client.kline_calls), 2)
+        finally:
+            self.mock_client.empty = False
+
+    def test_grace(self):
+        interval = 900
+        key = f'{kline_store.prefix}:TESTNET3_RINKEBY:{interval}'
+
+        # A couple of seconds after the end of the candle of `DAY`
+        with mock.patch('stemerald.klines.time.time', return_value=DAY + interval + 2):
+            self.assertEqual(
+                kline_store.get('TESTNET3_RINKEBY', DAY - interval, DAY, interval),
+                [candle(DAY - interval), candle(DAY)]
+            )
+
+        # Not stored yet, it could still be changed
+        self.assertIsNotNone(redis_client.hget(key, DAY - interval))
+        self.assertIsNone(redis_client.hget(key, DAY))
+
+    def test_too_many_candles(self):
+        self.mock_client.kline_calls.clear()
+        self.request(
+            As.anonymous, 'KLINE', f'{self.url}/TESTNET3_RINKEBY',
+            query_string={'interval': 60, 'start': DAY - kline_store.max_candles * 60, 'end': DAY},
+            expected_status=400,
+            expected_headers={'x-reason': 'too-many-candles'}
+        )
+        self.assertEqual(self.mock_client.kline_calls, [])
+
+    def test_aggregate_klines(self):
+        candles = [
+            [0, '10', '12', '13', '9', '1', '10', 'M'],
+            [60, '12', '11', '15', '11', '2.5', '30', 'M'],
+            [3600, '11', '11', '11', '11', '0', '0', 'M'],
+        ]
+        self.assertEqual(aggregate_klines(candles, 3600), [
+            [0, '10', '11', '15', '9', '3.5', '40', 'M'],
+            [3600, '11', '11', '11', '11', '0', '0', 'M'],
+        ])
@@ -0,0 +1,95 @@
+import redis
+import ujson
+
+from stemerald.cache import market_data_cache, redis_client
+from stemerald.models import Admin, Cryptocurrency, Market
+from stemerald.stexchange import StexchangeClient, stexchange_client
+from stemerald.tests.helpers import WebTestCase, As
+
+
+class MarketCacheTestCase(WebTestCase):
+    url = '/apiv2/markets'
+
+    # noinspection PyArgumentList
+    @classmethod
+    def mockup(cls):
+        cls._flush_redis_db()
+
+        admin1 = Admin()
+        admin1.email = 'admin1@test.com'
+        admin1.password = '123456'
+        admin1.is_active = True
+        cls.session.add(admin1)
+
+        testnet = Cryptocurrency(symbol='TESTNET3', name='TESTNET3', wallet_id='TESTNET3')
+        rinkeby = Cryptocurrency(symbol='RINKEBY', name='RINKEBY', wallet_id='RINKEBY')
+        cls.session.add(Market(name='TESTNET3_RINKEBY', base_currency=rinkeby, quote_currency=testnet))
+
+        cls.session.commit()
+
+        class MockStexchangeClient(StexchangeClient):
+            def __init__(self, headers=None):
+                super().__init__("", headers)
+                self.depth_calls = 0
+
+            def order_depth(self, market, limit, interval):
+                self.depth_calls += 1
+                return ujson.loads("""{"asks": [], "bids": [["2", "97"]]}""")
+
+        cls.mock_client = MockStexchangeClient()
+        stexchange_client._set_instance(cls.mock_client)
+
+    def test_depth_cache(self):
+        for i in range(3):
+            response, ___ = self.request(
+                As.anonymous, 'DEPTH', f"{self.url}/TESTNET3_RINKEBY",
+                query_string={'interval': 0, 'limit': 10}
+            )
+            self.assertEqual(1, len(response['bids']))
+
+        # Just the first one reaches the engine
+        self.assertEqual(self.mock_client.depth_calls, 1)
+
+        self.login('admin1@test.com', '123456')
+        response, ___ = self.request(As.admin, 'GET', '/apiv2/metrics')
+        self.assertEqual(response['marketCache']['order_depth']['hits'], 2)
+        self.assertEqual(response['marketCache']['order_depth']['misses'], 1)
+
+    def test_lock_ownership(self):
+        cache = market_data_cache.proxied_object
+        key = cache._key('market_last', ['OWNERSHIP'])
+        lock_key = f'{key}:lock'
+
+        def fetch():
+            # Took longer than the lock timeout, so the lock is taken by another caller meanwhile
+            redis_client.set(lock_key, 'another-caller')
+            return '2'
+
+        self.assertEqual(cache._get_or_fetch('market_last', key, 1, fetch), '2')
+        self.assertEqual(redis_client.get(lock_key), b'another-caller')
+        redis_client.delete(lock_key, key)
+
+    def test_write_error(self):
+        cache = market_data_cache.proxied_object
+        key = cache._key('market_last', ['WRITE_ERROR'])
+        original = redis_client._get_instance()
+
+        class FailingWrites:
+            def __getattr__(self, name):
+                return getattr(original, name)
+
+            def set(self, name, *args, **kwargs):
+                if not name.endswith(':lock'):
+                    raise redis.ConnectionError()
+                return original.set(name, *args, **kwargs)
+
+        fetches = []
+        redis_client._set_instance(FailingWrites())
+        try:
+            self.assertEqual(cache._get_or_fetch('market_last', key, 1, lambda: fetches.append(1) or '2'), '2')
+        finally:
+            redis_client._set_instance(original)
+
+        # Not fetched again, and the lock is released
+        self.assertEqual(len(fetches), 1)
+        self.assertFalse(redis_client.exists(f'{key}:lock'))
@@ -0,0 +1,46 @@
+from restfulpy.orm import DBSession
+
+from stemerald.models import Client
+from stemerald.tests.helpers import WebTestCase
+
+
+class MemberClaimsTestCase(WebTestCase):
+
+    # noinspection PyArgumentList
+    @classmethod
+    def mockup(cls):
+        client1 = Client()
+        client1.email = 'client1@test.com'
+        client1.password = '123456'
+        client1.is_active = True
+        cls.session.add(client1)
+        cls.session.commit()
+        cls.client1_id = client1.id
+
+    def test_member_claims_cache(self):
+        authenticator = self.application.__authenticator__
+
+        claims = authenticator.get_member_claims(self.client1_id)
+        self.assertEqual(claims['email'], 'client1@test.com')
+        self.assertIn('distrusted_client', claims['roles'])
+
+        # Changed without forgetting the claims, so the cached ones are used
+        client1 = self.session.query(Client).get(self.client1_id)
+        client1.is_email_verified = True
+        self.session.commit()
+        DBSession.remove()
+        self.assertIn('distrusted_client', authenticator.get_member_claims(self.client1_id)['roles'])
+
+        # Forgotten after the commit
+        authenticator.forget_member_claims_after_commit(self.client1_id)
+        self.assertIn('distrusted_client', authenticator.get_member_claims(self.client1_id)['roles'])
+        DBSession.commit()
+        self.assertIn('semitrusted_client', authenticator.get_member_claims(self.client1_id)['roles'])
+
+        # Logging in always uses the fresh claims
+        client1.is_evidence_verified = True
+        self.session.commit()
+        DBSession.remove()
+        token = self.login('client1@test.com', '123456')
+        self.assertIsNotNone(token)
+        self.assertIn('trusted_client', authenticator.get_member_claims(self.client1_id)['roles'])
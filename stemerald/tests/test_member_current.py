@@ -0,0 +1,54 @@
+from nanohttp import context
+from nanohttp.contexts import Context
+from restfulpy.orm import DBSession
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from stemerald.models import Client, Member
+from stemerald.tests.helpers import WebTestCase
+
+
+class MemberCurrentTestCase(WebTestCase):
+
+    # noinspection PyArgumentList
+    @classmethod
+    def mockup(cls):
+        client1 = Client()
+        client1.email = 'client1@test.com'
+        client1.password = '123456'
+        client1.is_active = True
+        cls.session.add(client1)
+        cls.session.commit()
+        cls.client1_id = client1.id
+
+    def setUp(self):
+        self.statements = []
+        event.listen(Engine, 'before_cursor_execute', self._count)
+
+    def tearDown(self):
+        event.remove(Engine, 'before_cursor_execute', self._count)
+        DBSession.remove()
+
+    def _count(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    def test_current(self):
+        principal = self.session.query(Client).get(self.client1_id).create_jwt_principal()
+        self.statements.clear()
+
+        with Context({}):
+            context.identity = principal
+
+            client = Client.current()
+            self.assertEqual(client.id, self.client1_id)
+            self.assertEqual(len(self.statements), 1)
+
+            # Memoized, and resolved from the identity map by the other classes
+            self.assertIs(Client.current(), client)
+            self.assertIs(Member.current(), client)
+            self.assertEqual(len(self.statements), 1)
+
+        # A new request
+        with Context({}):
+            context.identity = principal
+            self.assertIs(Client.current(), client)
@@ -0,0 +1,72 @@
+from decimal import Decimal
+
+from restfulpy.testing import FormParameter
+
+from stemerald.models import Admin, Market
+from stemerald.models.currencies import Cryptocurrency, Fiat
+from stemerald.registry import MetadataRegistry, metadata_registry
+from stemerald.tests.helpers import WebTestCase, As
+
+
+class MetadataRegistryTestCase(WebTestCase):
+    url = '/apiv2/currencies'
+
+    # noinspection PyArgumentList
+    @classmethod
+    def mockup(cls):
+        admin1 = Admin()
+        admin1.email = 'admin1@test.com'
+        admin1.password = '123456'
+        admin1.is_active = True
+        cls.session.add(admin1)
+
+        usd = Fiat(symbol='USD', name='USA Dollar')
+        btc = Cryptocurrency(symbol='BTC', name='Bitcoin', wallet_id='BTC')
+        cls.session.add(usd)
+        cls.session.add(btc)
+        cls.session.add(Market(name='BTC_USD', base_currency=btc, quote_currency=usd))
+
+        cls.session.commit()
+
+    def test_lookups(self):
+        market = metadata_registry.get_market('BTC_USD')
+        self.assertEqual(market.base_currency.symbol, 'BTC')
+        self.assertEqual(market.quote_currency.symbol, 'USD')
+        self.assertIsNone(metadata_registry.get_market('USD_BTC'))
+
+        self.assertIsInstance(metadata_registry.get_currency('BTC'), Cryptocurrency)
+        self.assertIsNotNone(metadata_registry.get_currency('BTC', type_=Cryptocurrency))
+        self.assertIsNone(metadata_registry.get_currency('USD', type_=Cryptocurrency))
+        self.assertIsNone(metadata_registry.get_currency('ETH'))
+
+    def test_invalidation_on_edit(self):
+        self.login('admin1@test.com', '123456')
+        self.assertNotEqual(metadata_registry.get_currency('BTC').withdraw_min, Decimal('0.01'))
+
+        self.request(
+            As.admin, 'EDIT', f'{self.url}/BTC',
+            params=[
+                FormParameter('withdrawMin', '0.01'),
+            ]
+        )
+
+        self.assertEqual(metadata_registry.get_currency('BTC').withdraw_min, Decimal('0.01'))
+
+    def test_invalidation_while_loading(self):
+        registry = MetadataRegistry()
+        registry._ensure_listener = lambda: None
+        loads = []
+
+        def load():
+            loads.append(1)
+            if len(loads) == 1:
+                # Committed and invalidated by another thread, after this one has read the rows
+                registry.invalidate(publish=False)
+            return {'markets': {}, 'currencies': {}, 'payment_gateways': {}, 'load': len(loads)}
+
+        registry._load = load
+
+        self.assertEqual(registry.snapshot['load'], 1)
+        # The one which is loaded before the invalidation is not kept
+        self.assertEqual(registry.snapshot['load'], 2)
+        self.assertEqual(registry.snapshot['load'], 2)
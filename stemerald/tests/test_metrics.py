@@ -0,0 +1,32 @@
+from stemerald.models import Admin
+from stemerald.tests.helpers import WebTestCase, As
+
+
+class MetricsTestCase(WebTestCase):
+    url = '/apiv2/metrics'
+
+    # noinspection PyArgumentList
+    @classmethod
+    def mockup(cls):
+        admin1 = Admin()
+        admin1.email = 'admin1@test.com'
+        admin1.password = '123456'
+        admin1.is_active = True
+        cls.session.add(admin1)
+
+        cls.session.commit()
+
+    def test_metrics(self):
+        self.login('admin1@test.com', '123456')
+
+        response, ___ = self.request(As.admin, 'GET', self.url)
+
+        self.assertIn('stexchange', response)
+        self.assertIn('poolSize', response['stexchange'])
+        self.assertIn('inFlight', response['stexchange'])
+        self.assertIn('peakInFlight', response['stexchange'])
+        self.assertIn('saturated', response['stexchange'])
+        self.assertIn('timeouts', response['stexchange'])
+
+        self.logout()
+        self.request(As.anonymous, 'GET', self.url, expected_status=401)
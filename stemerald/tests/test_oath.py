@@ -0,0 +1,38 @@
+from freezegun import freeze_time
+from nanohttp import settings
+
+from stemerald.oath import Oath
+from stemerald.tests.helpers import WebTestCase
+
+
+class OathTestCase(WebTestCase):
+
+    @classmethod
+    def mockup(cls):
+        cls._flush_redis_db()
+
+    def test_verify(self):
+        oath = Oath(seed=settings.mobile_phone_verification.seed, derivate_seed_from='client1@test.com')
+
+        with freeze_time('2019-01-01 00:00:00'):
+            code = oath.generate('19954395345')
+
+        # Inside the window
+        for at, drift in (('2018-12-31 23:57:00', 3), ('2019-01-01 00:00:30', 0), ('2019-01-01 00:03:00', -3)):
+            with freeze_time(at):
+                self.assertEqual(oath._match('19954395345', code), drift)
+
+        # Out of the window, or another challenge
+        with freeze_time('2019-01-01 00:04:00'):
+            self.assertEqual(oath.verify('19954395345', code), (False, 0))
+        with freeze_time('2019-01-01 00:00:00'):
+            self.assertEqual(oath.verify('19954395346', code), (False, 0))
+
+        # Just once
+        with freeze_time('2019-01-01 00:01:00'):
+            self.assertEqual(oath.verify('19954395345', code), (True, -1))
+            self.assertEqual(oath.verify('19954395345', code), (False, 0))
+
+        # The same seed, derived for another member
+        other = Oath(seed=settings.mobile_phone_verification.seed, derivate_seed_from='client2@test.com')
+        self.assertNotEqual(other.seed, oath.seed)
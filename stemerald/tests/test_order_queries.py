@@ -0,0 +1,112 @@
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from stemerald.models import Client, Market
+from stemerald.models.currencies import Fiat, Cryptocurrency
+from stemerald.stexchange import StexchangeClient, stexchange_client
+from stemerald.tests.helpers import WebTestCase, As
+
+
+def order_record(id_, client_id):
+    return {
+        'id': id_, 'market': 'BTC_USD', 'user': client_id, 'type': 1, 'side': 2, 'source': 'abc',
+        'price': '2', 'amount': '100', 'left': '97', 'taker_fee': '0.1', 'maker_fee': '0.1',
+        'deal_fee': '0.3', 'deal_stock': '3', 'deal_money': '6',
+        'ctime': 1547419213.026914, 'mtime': 1547419213.029483,
+    }
+
+
+def deal_record(id_, client_id):
+    return {
+        'id': id_, 'time': 1547419213.026914, 'user': client_id, 'role': 1,
+        'amount': '3', 'price': '2', 'deal': '6', 'fee': '0.3', 'deal_order_id': 62,
+    }
+
+
+class OrderQueryCountTestCase(WebTestCase):
+    """
+    The number of SQL queries per response should not depend on the number of the returned rows.
+    """
+    url = '/apiv2/orders'
+
+    # noinspection PyArgumentList
+    @classmethod
+    def mockup(cls):
+        client1 = Client()
+        client1.email = 'client1@test.com'
+        client1.password = '123456'
+        client1.is_active = True
+        client1.is_evidence_verified = True
+        cls.session.add(client1)
+
+        usd = Fiat(symbol='USD', name='USA Dollar', smallest_unit_scale=-1, normalization_scale=0)
+        btc = Cryptocurrency(symbol='BTC', name='Bitcoin', wallet_id='BTC', smallest_unit_scale=-4,
+                             normalization_scale=0)
+        cls.session.add(Market(name='BTC_USD', base_currency=btc, quote_currency=usd))
+        cls.session.commit()
+
+        client_id = client1.id
+
+        class MockStexchangeClient(StexchangeClient):
+            def __init__(self, headers=None):
+                super().__init__("", headers)
+                self.page_size = 1
+
+            def order_pending(self, user_id, market, offset, limit):
+                return {'offset': offset, 'limit': limit, 'total': self.page_size,
+                        'records': [order_record(i, client_id) for i in range(self.page_size)]}
+
+            def order_deals(self, order_id, offset, limit):
+                return {'offset': offset, 'limit': limit,
+                        'records': [deal_record(i, client_id) for i in range(self.page_size)]}
+
+        stexchange_client._set_instance(MockStexchangeClient())
+
+    def count_queries(self, page_size, *args, **kwargs):
+        stexchange_client.page_size = page_size
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *a):
+            statements.append(statement)
+
+        event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            response, ___ = self.request(*args, **kwargs)
+        finally:
+            event.remove(Engine, 'before_cursor_execute', before_cursor_execute)
+
+        return len(response), len(statements)
+
+    def test_order_get(self):
+        self.login('client1@test.com', '123456')
+        query_string = {'marketName': 'BTC_USD', 'status': 'pending'}
+
+        # Warming up
+        self.request(As.client, 'GET', self.url, query_string=query_string)
+
+        counts = set()
+        for page_size in (1, 5, 10):
+            rows, queries = self.count_queries(
+                page_size, As.client, 'GET', self.url, query_string=query_string, doc=False
+            )
+            self.assertEqual(rows, page_size)
+            counts.add(queries)
+
+        self.assertEqual(len(counts), 1)
+
+    def test_order_deals(self):
+        self.login('client1@test.com', '123456')
+        query_string = {'marketName': 'BTC_USD'}
+
+        # Warming up
+        self.request(As.client, 'DEAL', f'{self.url}/62', query_string=query_string)
+
+        counts = set()
+        for page_size in (1, 20, 100):
+            rows, queries = self.count_queries(
+                page_size, As.client, 'DEAL', f'{self.url}/62', query_string=query_string, doc=False
+            )
+            self.assertEqual(rows, page_size)
+            counts.add(queries)
+
+        self.assertEqual(len(counts), 1)
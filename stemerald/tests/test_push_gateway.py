@@ -0,0 +1,139 @@
+import asyncio
+import unittest
+
+import ujson
+from aiohttp.test_utils import TestClient, TestServer
+
+from stemerald.models import Cryptocurrency, Market
+from stemerald.pushgateway import PushGateway
+from stemerald.stexchange import AsyncStexchangeClient, async_stexchange_client
+
+
+class MockAsyncStexchangeClient(AsyncStexchangeClient):
+    def __init__(self):
+        super().__init__('')
+        self.last = '2'
+        self.deals = [{'id': 1, 'time': 1547419014.44956, 'price': '2', 'amount': '3', 'type': 'sell'}]
+
+    def _result(self, request):
+        method, params = request['method'], request['params']
+        if method == 'order.depth':
+            return {'asks': [], 'bids': [['2', '97']]}
+        if method == 'market.last':
+            return self.last
+        if method == 'market.status_today':
+            return {'open': '1', 'high': '3', 'low': '1', 'last': self.last, 'volume': '10', 'deal': '20'}
+        if method == 'market.deals':
+            return [deal for deal in self.deals if deal['id'] > params[2]]
+
+    async def _post(self, payload, timeout=None, check_status=False):
+        await asyncio.sleep(0)
+        return [
+            {'id': request['id'], 'error': None, 'result': self._result(request)}
+            for request in ujson.loads(payload)
+        ]
+
+
+class PushGatewayTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+        testnet = Cryptocurrency(
+            symbol='TESTNET3', name='TESTNET3', wallet_id='TESTNET3', smallest_unit_scale=-8, normalization_scale=0
+        )
+        rinkeby = Cryptocurrency(
+            symbol='RINKEBY', name='RINKEBY', wallet_id='RINKEBY', smallest_unit_scale=-8, normalization_scale=0
+        )
+        self.market = Market(name='TESTNET3_RINKEBY', base_currency=rinkeby, quote_currency=testnet)
+
+        self.mock_client = MockAsyncStexchangeClient()
+        async_stexchange_client._set_instance(self.mock_client)
+
+        self.gateway = PushGateway(
+            poll_gap=0.05,
+            get_market=lambda name: self.market if name == self.market.name else None
+        )
+
+    def tearDown(self):
+        self.loop.close()
+
+    def run_with_client(self, test):
+        async def run():
+            client = TestClient(TestServer(self.gateway.create_application()))
+            await client.start_server()
+            try:
+                await test(client)
+            finally:
+                await client.close()
+
+        self.loop.run_until_complete(run())
+
+    def test_websocket(self):
+        async def test(client):
+            sockets = [await client.ws_connect('/websocket') for __ in range(3)]
+            for ws in sockets:
+                await ws.send_str(ujson.dumps({
+                    'action': 'subscribe', 'market': 'TESTNET3_RINKEBY', 'channels': ['last', 'deals']
+                }))
+
+            for ws in sockets:
+                messages = {}
+                while len(messages) < 2:
+                    message = ujson.loads((await ws.receive(timeout=2)).data)
+                    messages[message['channel']] = message['data']
+                self.assertEqual(messages['last']['price'], '2.00000000')
+                self.assertEqual(len(messages['deals']), 1)
+
+            # The market is polled once for all of the clients
+            self.assertEqual(list(self.gateway.feeds), ['TESTNET3_RINKEBY'])
+            self.assertEqual(len(self.gateway.feeds['TESTNET3_RINKEBY'].subscribers), 3)
+
+            # Just the changes are pushed
+            self.mock_client.last = '3'
+            self.mock_client.deals.insert(
+                0, {'id': 2, 'time': 1547419017.44956, 'price': '3', 'amount': '1', 'type': 'buy'}
+            )
+            for ws in sockets:
+                messages = {}
+                while len(messages) < 2:
+                    message = ujson.loads((await ws.receive(timeout=2)).data)
+                    messages[message['channel']] = message['data']
+                self.assertEqual(messages['last']['price'], '3.00000000')
+                self.assertEqual([deal['id'] for deal in messages['deals']], [2])
+
+            await sockets[0].send_str(ujson.dumps({'action': 'subscribe', 'market': 'BAD'}))
+            self.assertEqual(ujson.loads((await sockets[0].receive(timeout=2)).data)['error'], 'bad-market')
+
+            for ws in sockets:
+                await ws.close()
+
+            # Not polled any more
+            await asyncio.sleep(0.2)
+            self.assertEqual(self.gateway.feeds, {})
+
+        self.run_with_client(test)
+
+    def test_server_sent_events(self):
+        async def test(client):
+            response = await client.get('/markets/TESTNET3_RINKEBY/events?channels=depth')
+            self.assertEqual(response.status, 200)
+            self.assertEqual(response.headers['Content-Type'], 'text/event-stream')
+
+            self.assertEqual(await response.content.readline(), b'event: depth\n')
+            message = ujson.loads((await response.content.readline())[len(b'data: '):])
+            self.assertEqual(message['data']['bids'], [{'price': '2.00000000', 'amount': '97.00000000'}])
+            response.close()
+
+            response = await client.get('/markets/TESTNET3_RINKEBY/events?channels=bad')
+            self.assertEqual(response.status, 400)
+
+            response = await client.get('/markets/BAD/events')
+            self.assertEqual(response.status, 400)
+
+        self.run_with_client(test)
+
+
+if __name__ == '__main__':  # pragma: no cover
+    unittest.main()
@@ -34,3 +34,19 @@ class SessionsGetTestCase(WebTestCase):
         response2, ___ = self.request(As.member, 'GET', self.url, doc=False)
 
         self.assertEqual(len(response2) - len(response1), 2)
+
+    def test_members_sessions_info(self):
+        self.login('client1@test.com', '123456')
+        self.login('client2@test.com', '123456')
+
+        authenticator = self.application.__authenticator__
+        result = authenticator.get_members_sessions_info([1, 2, 3])
+
+        self.assertEqual(set(result.keys()), {1, 2, 3})
+        self.assertEqual(result[3], [])
+        for member_id in (1, 2):
+            self.assertGreater(len(result[member_id]), 0)
+            self.assertEqual(
+                sorted(i['id'] for i in result[member_id]),
+                sorted(i['id'] for i in authenticator.get_member_sessions_info(member_id))
+            )
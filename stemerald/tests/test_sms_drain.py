@@ -0,0 +1,60 @@
+from nanohttp import settings
+from restfulpy.orm import session_factory
+
+from stemerald.loopers import drain_sms_batch
+from stemerald.models import VerificationSms
+from stemerald.sms import create_sms_provider, SmsProvider
+from stemerald.tests.helpers import WebTestCase
+
+BAD_NUMBER = '+11000000000'
+
+
+class RecordingSmsProvider(SmsProvider):
+    messages = []
+
+    def send_as_verification_code(self, to_number, code, template):
+        super().send_as_verification_code(to_number, code, template)
+        if to_number == BAD_NUMBER:
+            raise ValueError('Bad number')
+        self.messages.append((to_number, code, template))
+
+
+class SmsDrainTestCase(WebTestCase):
+
+    @classmethod
+    def configure_app(cls):
+        super().configure_app()
+        settings.merge("""
+        sms:
+          provider: stemerald.tests.test_sms_drain.RecordingSmsProvider
+        """)
+
+    # noinspection PyArgumentList
+    @classmethod
+    def mockup(cls):
+        for to in ('+11000000001', BAD_NUMBER, '+11000000003'):
+            cls.session.add(VerificationSms(to=to, body={'code': to[-4:], 'template': 'mobile'}))
+        cls.session.commit()
+
+    def test_drain(self):
+        self.assertIs(create_sms_provider(), create_sms_provider())
+
+        session = session_factory(expire_on_commit=False)
+        try:
+            self.assertEqual(drain_sms_batch(session, 2), 2)
+            self.assertEqual(drain_sms_batch(session, 2), 1)
+            self.assertEqual(drain_sms_batch(session, 2), 0)
+        finally:
+            session.close()
+
+        self.assertEqual(
+            sorted(RecordingSmsProvider.messages),
+            [('+11000000001', '0001', 'mobile'), ('+11000000003', '0003', 'mobile')]
+        )
+
+        self.session.expire_all()
+        tasks = {t.to: t for t in self.session.query(VerificationSms)}
+        self.assertEqual(tasks['+11000000001'].status, 'success')
+        self.assertEqual(tasks['+11000000003'].status, 'success')
+        self.assertEqual(tasks[BAD_NUMBER].status, 'failed')
+        self.assertIn('Bad number', tasks[BAD_NUMBER].fail_reason)
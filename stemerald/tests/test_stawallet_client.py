@@ -0,0 +1,64 @@
+import threading
+import unittest
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+from stemerald.stawallet import StawalletClient, StawalletHttpException
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """
+    Fails the first request of each path with 503.
+    """
+    requests = []
+
+    def _respond(self):
+        self.requests.append((self.command, self.path))
+        if sum(1 for r in self.requests if r == (self.command, self.path)) == 1:
+            self.send_response(503)
+            self.end_headers()
+            return
+
+        body = b'{"status": "success"}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = _respond
+
+    def log_message(self, *args):
+        pass
+
+
+class StawalletClientTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = HTTPServer(('127.0.0.1', 0), FlakyHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.client = StawalletClient(f'http://127.0.0.1:{cls.server.server_port}', retry_backoff=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_retry(self):
+        # Retried
+        self.assertEqual(self.client.get_wallets(), {'status': 'success'})
+        self.assertEqual(FlakyHandler.requests.count(('GET', '/wallets')), 2)
+
+        # Not retried
+        with self.assertRaises(StawalletHttpException) as cm:
+            self.client.post_invoice('BTC', 1)
+        self.assertEqual(cm.exception.http_status_code, 503)
+        self.assertEqual(len([r for r in FlakyHandler.requests if r[0] == 'POST']), 1)
+
+    def test_session(self):
+        self.assertIs(self.client.session, self.client.session)
+        self.assertEqual(self.client.timeout, (3, 10))
+
+
+if __name__ == '__main__':  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,165 @@
+from nanohttp import settings
+
+from stemerald.deposits import credit_deposits
+from stemerald.models import Client, Cryptocurrency, Notification
+from stemerald.stawallet import StawalletClient, StawalletHttpException, stawallet_client
+from stemerald.stexchange import StexchangeClient, stexchange_client, RepeatUpdateException
+from stemerald.tests.helpers import WebTestCase, As
+
+SECRET = 'stawallet-webhook-secret'
+
+
+def deposit_of(confirmed, confirmations_left, id_=1):
+    return {
+        'id': id_,
+        'invoice': {
+            'id': 1,
+            'wallet': 'BTC',
+            'extra': None,
+            'user': '1',
+            'creation': '2019-03-19T12:38:11.310+03:00',
+            'expiration': None,
+            'address': {'id': 2, 'wallet': 'BTC', 'address': '1D6CqUvHtQRXU4TZrrj5j1iofo8f4oXyLj', 'active': True}
+        },
+        'grossAmount': 198763,
+        'netAmount': 198000,
+        'proof': {
+            'txHash': '5061556f857e118aae8d948496f61f645e12cf7ca2a107f8e4ae78b535e86dfb',
+            'blockHash': '000000000000000000188252ee9277e8f60482a91b7f3cc9a4a7fb75ded482a8',
+            'blockHeight': 562456,
+            'confirmationsLeft': confirmations_left,
+            'confirmationsTrace': [],
+            'link': None,
+            'extra': None,
+            'error': None
+        },
+        'status': 'ACCEPTED',
+        'extra': None,
+        'confirmed': confirmed
+    }
+
+
+class StawalletHookTestCase(WebTestCase):
+    url = '/apiv2/stawallet-hooks/deposits'
+
+    @classmethod
+    def configure_app(cls):
+        super().configure_app()
+        settings.merge(f"""
+        stawallet:
+          webhook_secret: {SECRET}
+        """)
+
+    # noinspection PyArgumentList
+    @classmethod
+    def mockup(cls):
+        cls._flush_redis_db()
+
+        client1 = Client()
+        client1.email = 'client1@test.com'
+        client1.password = '123456'
+        client1.is_active = True
+        cls.session.add(client1)
+        cls.session.add(Cryptocurrency(symbol='BTC', name='Bitcoin', wallet_id='BTC'))
+        cls.session.commit()
+
+        class MockStexchangeClient(StexchangeClient):
+            def __init__(self, headers=None):
+                super().__init__("", headers)
+                self.business_ids = set()
+                self.updates = []
+
+            def balance_update(self, user_id, asset, business, business_id, change, detail):
+                if business_id in self.business_ids:
+                    raise RepeatUpdateException(10)
+                self.business_ids.add(business_id)
+                self.updates.append((user_id, asset, str(change)))
+                return {}
+
+        class MockStawalletClient(StawalletClient):
+            def __init__(self, headers=None):
+                super().__init__("", headers)
+                self.deposits = {}
+
+            def get_deposit(self, wallet_id, deposit_id):
+                if (wallet_id, deposit_id) not in self.deposits:
+                    raise StawalletHttpException(404, 'Not found')
+                return self.deposits[(wallet_id, deposit_id)]
+
+        cls.mock_client = MockStexchangeClient()
+        stexchange_client._set_instance(cls.mock_client)
+        cls.mock_stawallet_client = MockStawalletClient()
+        stawallet_client._set_instance(cls.mock_stawallet_client)
+
+    def test_deposit_events(self):
+        headers = {'X-Stawallet-Secret': SECRET}
+        event = {'walletId': 'BTC', 'depositId': 1}
+        notifications_before = self.session.query(Notification).count()
+
+        # 1. Not authenticated
+        self.request(As.anonymous, 'POST', self.url, json=event, expected_status=403)
+        self.request(
+            As.anonymous, 'POST', self.url, json=event, headers={'X-Stawallet-Secret': 'bad'}, expected_status=403
+        )
+
+        # 2. An unconfirmed deposit, pushed twice
+        self.mock_stawallet_client.deposits[('BTC', 1)] = deposit_of(False, 2)
+        for __ in range(2):
+            self.request(As.anonymous, 'POST', self.url, json=event, headers=headers)
+
+        self.assertNotIn(1, self.mock_client.business_ids)
+        self.assertEqual(self.session.query(Notification).count(), notifications_before + 1)
+
+        # 3. The confirmation, pushed twice
+        self.mock_stawallet_client.deposits[('BTC', 1)] = deposit_of(True, 0)
+        for __ in range(2):
+            self.request(As.anonymous, 'POST', self.url, json=event, headers=headers)
+
+        self.assertIn(1, self.mock_client.business_ids)
+        self.assertEqual(self.session.query(Notification).count(), notifications_before + 2)
+
+        # 4. Unknown wallet or deposit
+        self.request(
+            As.anonymous, 'POST', self.url, json={'walletId': 'ETH', 'depositId': 1}, headers=headers,
+            expected_status=400
+        )
+        self.request(
+            As.anonymous, 'POST', self.url, json={'walletId': 'BTC', 'depositId': 404}, headers=headers,
+            expected_status=400
+        )
+
+    def test_forged_deposit_event(self):
+        headers = {'X-Stawallet-Secret': SECRET}
+        self.mock_stawallet_client.deposits[('BTC', 2)] = deposit_of(True, 0, id_=2)
+
+        # The user and the amount of the body are ignored, the ones of stawallet are credited
+        forged = deposit_of(True, 0, id_=2)
+        forged['invoice']['user'] = '2'
+        forged['netAmount'] = 10 ** 12
+        self.request(As.anonymous, 'POST', self.url, json={'walletId': 'BTC', 'deposit': forged}, headers=headers)
+
+        btc = self.session.query(Cryptocurrency).filter(Cryptocurrency.symbol == 'BTC').one()
+        self.assertIn((1, 'BTC', str(btc.smallest_unit_to_normalized(198000))), self.mock_client.updates)
+        self.assertFalse(any(user_id == 2 for user_id, __, __ in self.mock_client.updates))
+
+    def test_bulk_crediting(self):
+        btc = self.session.query(Cryptocurrency).filter(Cryptocurrency.symbol == 'BTC').one()
+        notifications_before = self.session.query(Notification).count()
+
+        deposits = [deposit_of(i % 2 == 0, 0, id_=100 + i) for i in range(10)]
+        credit_deposits(self.session, btc, deposits)
+        self.session.commit()
+
+        self.assertEqual(self.session.query(Notification).count(), notifications_before + 10)
+        self.assertTrue({100, 102, 104, 106, 108}.issubset(self.mock_client.business_ids))
+
+        notifications = self.session.query(Notification) \
+            .order_by(Notification.id.desc()) \
+            .limit(10) \
+            .all()
+        self.assertEqual({n.member_id for n in notifications}, {1})
+        self.assertEqual({n.status for n in notifications}, {'new'})
+        self.assertEqual(
+            [n.title for n in reversed(notifications)],
+            ['Your balance has been increased', 'New deposit in the way'] * 5
+        )
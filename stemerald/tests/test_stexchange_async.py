@@ -0,0 +1,94 @@
+import asyncio
+import unittest
+
+from stemerald.stexchange import AsyncStexchangeClient, OrderNotFoundException, ServiceTimoutException
+
+
+class MockAsyncStexchangeClient(AsyncStexchangeClient):
+    def __init__(self):
+        super().__init__('')
+        self.payloads = []
+
+    async def _post(self, payload, timeout=None, check_status=False):
+        self.payloads.append(payload)
+        await asyncio.sleep(0)
+        if 'market.last' in payload:
+            return {'id': 1, 'error': None, 'result': '2.00000000'}
+        if 'order.depth' in payload:
+            return {'id': 2, 'error': None, 'result': {'asks': [], 'bids': [['2', '97']]}}
+        return {'id': 3, 'error': {'code': 10, 'message': 'order not found'}, 'result': None}
+
+
+class NoBatchAsyncStexchangeClient(MockAsyncStexchangeClient):
+    async def _post(self, payload, timeout=None, check_status=False):
+        if payload.startswith('['):
+            raise ValueError('Not a JSON body')
+        return await super()._post(payload, timeout=timeout)
+
+
+class AsyncStexchangeClientTestCase(unittest.TestCase):
+
+    def test_fan_out(self):
+        client = MockAsyncStexchangeClient()
+
+        async def fan_out():
+            return await asyncio.gather(
+                client.market_last('BTC_USD'),
+                client.order_depth('BTC_USD', 10, 0),
+            )
+
+        last, depth = asyncio.get_event_loop().run_until_complete(fan_out())
+        self.assertEqual(last, '2.00000000')
+        self.assertEqual(depth['bids'], [['2', '97']])
+        self.assertEqual(len(client.payloads), 2)
+
+    def test_exceptions(self):
+        client = MockAsyncStexchangeClient()
+
+        with self.assertRaises(OrderNotFoundException):
+            asyncio.get_event_loop().run_until_complete(client.order_cancel(1, 'BTC_USD', 1))
+
+    def test_batch_fallback(self):
+        client = NoBatchAsyncStexchangeClient()
+
+        async def batch_calls():
+            async with client.batch() as batch:
+                batch.market_last('BTC_USD')
+                batch.order_depth('BTC_USD', 10, 0)
+            return batch.results
+
+        last, depth = asyncio.get_event_loop().run_until_complete(batch_calls())
+        self.assertEqual(last, '2.00000000')
+        self.assertEqual(depth['bids'], [['2', '97']])
+
+    def test_timeout(self):
+        loop = asyncio.get_event_loop()
+
+        async def never_respond(reader, writer):
+            await reader.read(1024)
+            await asyncio.sleep(10)
+
+        server = loop.run_until_complete(asyncio.start_server(never_respond, '127.0.0.1', 0))
+        client = AsyncStexchangeClient(
+            f'http://127.0.0.1:{server.sockets[0].getsockname()[1]}', connect_timeout=1, read_timeout=0.2
+        )
+
+        async def batch_calls():
+            async with client.batch() as batch:
+                batch.market_last('BTC_USD')
+
+        try:
+            # The timeouts of the session are applied when there is no timeout per call
+            with self.assertRaises(ServiceTimoutException):
+                loop.run_until_complete(asyncio.wait_for(client.market_last('BTC_USD'), 5))
+
+            with self.assertRaises(ServiceTimoutException):
+                loop.run_until_complete(asyncio.wait_for(batch_calls(), 5))
+        finally:
+            loop.run_until_complete(client.close())
+            server.close()
+            loop.run_until_complete(server.wait_closed())
+
+
+if __name__ == '__main__':  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,96 @@
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+import ujson
+
+from stemerald.stexchange import StexchangeClient, BalanceNotEnoughException, InvalidArgumentException
+
+
+class BatchStexchangeClient(StexchangeClient):
+    def __init__(self):
+        super().__init__('')
+        self.payloads = []
+
+    def _post(self, payload, timeout=None, check_status=False):
+        self.payloads.append(ujson.loads(payload))
+        return [
+            {'id': 3, 'error': {'code': 10, 'message': 'balance not enough'}, 'result': None},
+            {'id': 1, 'error': None, 'result': [{'name': 'BTC', 'prec': 8}]},
+            {'id': 2, 'error': {'code': 1, 'message': 'invalid argument'}, 'result': None},
+        ]
+
+
+class NoBatchHandler(BaseHTTPRequestHandler):
+    """
+    A JSON-RPC server without the batch support, which rejects the arrays with 400 and a non-JSON body.
+    """
+
+    def do_POST(self):
+        request = ujson.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        if isinstance(request, list):
+            body = b'Bad Request'
+            self.send_response(400)
+        else:
+            body = ujson.dumps({'id': request['id'], 'error': None, 'result': request['method']}).encode()
+            self.send_response(200)
+
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StexchangeBatchTestCase(unittest.TestCase):
+
+    def test_batch(self):
+        client = BatchStexchangeClient()
+
+        with client.batch() as batch:
+            batch.asset_list()
+            batch.balance_query(1, 'BTC')
+            batch.balance_update(1, 'BTC', 'deposit', 1, '1', {})
+
+        # One round trip for all of the calls
+        self.assertEqual(len(client.payloads), 1)
+        self.assertEqual(
+            ['asset.list', 'balance.query', 'balance.update'],
+            [request['method'] for request in client.payloads[0]]
+        )
+        self.assertTrue(all(request['jsonrpc'] == '2.0' for request in client.payloads[0]))
+
+        # Results are resolved in order and errors are mapped per item
+        self.assertEqual(batch.items[0].result, [{'name': 'BTC', 'prec': 8}])
+        self.assertIsInstance(batch.items[1].error, InvalidArgumentException)
+        self.assertIsInstance(batch.items[2].error, BalanceNotEnoughException)
+
+        with self.assertRaises(InvalidArgumentException):
+            __ = batch.results
+
+    def test_fallback(self):
+        server = HTTPServer(('127.0.0.1', 0), NoBatchHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            client = StexchangeClient(f'http://127.0.0.1:{server.server_port}')
+            with client.batch() as batch:
+                batch.asset_list()
+                batch.market_list()
+
+            self.assertEqual(batch.results, ['asset.list', 'market.list'])
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_request_ids(self):
+        client = StexchangeClient('')
+        with ThreadPoolExecutor(8) as executor:
+            ids = list(executor.map(lambda __: client._next_request_id(), range(10000)))
+
+        self.assertEqual(len(set(ids)), 10000)
+
+
+if __name__ == '__main__':  # pragma: no cover
+    unittest.main()
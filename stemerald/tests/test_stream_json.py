@@ -0,0 +1,45 @@
+import tracemalloc
+import unittest
+
+import ujson
+
+from stemerald.helpers import stream_json_list
+
+
+def rows(count):
+    for i in range(count):
+        yield {'time': 1547419213 + i * 60, 'o': '3700.00', 'c': '3710.00', 'volume': '0.12345678'}
+
+
+def consume(chunks):
+    size = 0
+    for chunk in chunks:
+        size += len(chunk)
+    return size
+
+
+class StreamJsonListTestCase(unittest.TestCase):
+
+    def test_encoding(self):
+        self.assertEqual(ujson.loads(''.join(stream_json_list([]))), [])
+        self.assertEqual(ujson.loads(''.join(stream_json_list([{'a': 1}]))), [{'a': 1}])
+
+        for count in (99, 100, 101, 250):
+            chunks = list(stream_json_list(rows(count), chunk_size=100))
+            self.assertEqual(len(chunks), count // 100 + 1)
+            self.assertEqual(ujson.loads(''.join(chunks)), list(rows(count)))
+
+    def test_peak_memory(self):
+        peaks = []
+        for count in (1000, 100000):
+            tracemalloc.start()
+            consume(stream_json_list(rows(count)))
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+        # 100 times more rows, but almost the same peak
+        self.assertLess(peaks[1], peaks[0] * 2)
+
+
+if __name__ == '__main__':  # pragma: no cover
+    unittest.main()
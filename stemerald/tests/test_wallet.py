@@ -3,6 +3,7 @@ from decimal import Decimal
 
 from restfulpy.testing import FormParameter
 
+from stemerald.controllers.wallet import _time_key
 from stemerald.models import Client, Cryptocurrency
 from stemerald.stawallet import StawalletClient, stawallet_client, StawalletHttpException
 from stemerald.stexchange import StexchangeClient, stexchange_client, BalanceNotEnoughException
@@ -446,6 +447,13 @@ class WalletTestCase(WebTestCase):
         self.assertIn('extra', response[0])
         self.assertIn('toAddress', response[0])
 
+        # 3.1. The deposits of all of the wallets
+        response, ___ = self.request(As.client, 'OVERVIEW', self.deposit_url)
+
+        self.assertEqual(len(response), 1)
+        self.assertEqual(1, response[0]['id'])
+        self.assertEqual('BTC', response[0]['cryptocurrencySymbol'])
+
         # 4. Get new deposit by id
         response, ___ = self.request(
             As.client, 'GET', f'{self.deposit_url}/1',
@@ -501,6 +509,12 @@ class WalletTestCase(WebTestCase):
         self.assertEqual(len(response), 1)
         self.assertEqual('abc-def-gh', response[0]['id'])
 
+        response, ___ = self.request(As.semitrusted_client, 'OVERVIEW', self.withdraw_url)
+
+        self.assertEqual(len(response), 1)
+        self.assertEqual('abc-def-gh', response[0]['id'])
+        self.assertEqual('BTC', response[0]['cryptocurrencySymbol'])
+
     def test_schedule_withdraw(self):
         self.login('client1@test.com', '123456')
 
@@ -567,3 +581,12 @@ class WalletTestCase(WebTestCase):
             expected_status=400,
             expected_headers={'x-reason': 'already-submitted'}
         )
+
+    def test_time_key(self):
+        stamp = 1552988291.31
+        self.assertEqual(_time_key('2019-03-19T12:38:11.310+03:00'), stamp)
+        self.assertEqual(_time_key('2019-03-19T06:38:11.310-0300'), stamp)
+        self.assertEqual(_time_key('2019-03-19T09:38:11.31Z'), stamp)
+        self.assertEqual(_time_key('2019-03-19T09:38:11.310'), stamp)
+        self.assertEqual(_time_key(None), 0)
+        self.assertEqual(_time_key('2019-02-30T00:00:00'), 0)